@@ -7,7 +7,7 @@ AI-powered conversation transcription with speaker separation and intelligent su
 __version__ = "0.1.0"
 __author__ = "shaopei"
 
-from .conversation_transcriber import main as transcribe
+from .conversation_transcriber import main as transcribe, transcribe_file, transcribe_files
 from .batch_transcribe import main as batch_transcribe
 
-__all__ = ["transcribe", "batch_transcribe"] 
\ No newline at end of file
+__all__ = ["transcribe", "transcribe_file", "transcribe_files", "batch_transcribe"] 
\ No newline at end of file
@@ -1,21 +1,84 @@
 import os
+import re
+import csv
+import shutil
+import argparse
 import subprocess
-import glob
-from datetime import datetime
+import logging
 import time
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+import psutil
+
+try:
+    from .outputs import output_base, output_paths, write_output
+except ImportError:
+    # Running as a plain script
+    from outputs import output_base, output_paths, write_output
 
 # Get the directory where this script is located
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 SCRIPT = os.path.join(SCRIPT_DIR, "conversation_transcriber.py")
 
-def log(msg):
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+# Video file extensions picked up by the batch (compared lowercased)
+VIDEO_EXTS = frozenset((".mov", ".mp4"))
+
+# Each transcription job keeps roughly this many cores busy (whisper.cpp default)
+THREADS_PER_JOB = 4
+VALID_LANGUAGES = ['zh', 'en', 'ja', 'ko', 'fr', 'de', 'es', 'it', 'pt', 'ru']
+JOB_TIMEOUT = 12*3600  # 12h timeout in case of very large file
+LOG_TAIL_BYTES = 4096  # How much of a failed job's output to copy into the batch log
+
+# Load thresholds used to grow/shrink the number of concurrently running jobs
+CPU_LOW_PERCENT = 70
+CPU_HIGH_PERCENT = 85
+MEM_HIGH_PERCENT = 80
+LOAD_SAMPLE_SECONDS = 5
+
+# Raw transcript line, as written by the transcriber
+TRANSCRIPT_LINE_RE = re.compile(r"Speaker (\d+): \[(\d+\.\d+)-(\d+\.\d+)\] (.*)")
+
+logger = logging.getLogger("batch_transcribe")
+
+class AppendLogHandler(logging.Handler):
+    """Append each record with a single os.write on an O_APPEND fd.
+
+    POSIX makes such writes atomic (for lines up to PIPE_BUF), so several
+    batch processes can share one logfile without interleaving or a lock.
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def emit(self, record):
+        try:
+            os.write(self.fd, (self.format(record) + "\n").encode("utf-8"))
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        super().close()
+
+def setup_logging():
+    # Configure once: the file handler keeps the log open instead of reopening it per message
+    if logger.handlers:
+        return
+    formatter = logging.Formatter("[%(asctime)s] %(message)s", "%Y-%m-%d %H:%M:%S")
     # Create log file in the current working directory
     logfile = os.path.join(os.getcwd(), "batch_transcribe.log")
-    with open(logfile, "a", encoding="utf-8") as f:
-        f.write(f"[{now}] {msg}\n")
-    print(f"[{now}] {msg}")
+    for handler in (AppendLogHandler(logfile), logging.StreamHandler(sys.stdout)):
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+def log(msg):
+    logger.info(msg)
 
 def check_script_exists():
     if not os.path.exists(SCRIPT):
@@ -24,64 +87,328 @@ def check_script_exists():
         return False
     return True
 
-def main():
-    # Show help if requested
-    if "--help" in sys.argv or "-h" in sys.argv:
-        print("Usage: python3 batch_transcribe.py [TARGET_DIRECTORY] [OPTIONS]")
-        print("")
-        print("TARGET_DIRECTORY:")
-        print("  Directory containing video files (default: current directory)")
-        print("")
-        print("OPTIONS:")
-        print("  --no-refine    Skip transcript refinement (faster)")
-        print("  --summary      Generate conversation summaries")
-        print("  --verbose      Show detailed progress")
-        print("  --force        Overwrite existing output files")
-        print("  --lang LANG    Specify language (default: en, options: zh, ja, ko, fr, de, es, it, pt, ru)")
-        print("  --long_summary_prompt FILE  Use custom prompt file for summary generation")
-        print("  --rename [PREFIX]  Auto-rename files based on content summary (includes summary generation)")
-        print("  --help, -h     Show this help message")
-        print("")
-        print("EXAMPLES:")
-        print("  python3 ~/projects/conversation_transcriber/batch_transcribe.py")
-        print("  python3 ~/projects/conversation_transcriber/batch_transcribe.py . --verbose")
-        print("  python3 ~/projects/conversation_transcriber/batch_transcribe.py ~/Videos --lang zh --no-refine")
-        print("  python3 ~/projects/conversation_transcriber/batch_transcribe.py ~/Videos --summary  # With summaries")
-        print("  python3 ~/projects/conversation_transcriber/batch_transcribe.py ~/Videos --long_summary_prompt custom_prompt.txt")
-        print("  python3 ~/projects/conversation_transcriber/batch_transcribe.py ~/Videos --rename  # Auto-rename all files")
-        print("  python3 ~/projects/conversation_transcriber/batch_transcribe.py ~/Videos --rename Interview_Series  # With prefix")
-        print("  python3 ~/projects/conversation_transcriber/batch_transcribe.py ~/Videos  # Uses English (default)")
+def cuda_available():
+    # torch is only imported here, when --jobs is not given, to keep the batch runner light
+    try:
+        import torch
+    except ImportError:
+        return False
+    return torch.cuda.is_available()
+
+def default_jobs():
+    # Every job loads its own diarization and Whisper models onto the (first) NVIDIA GPU, and the
+    # load throttle does not see GPU memory: with CUDA, one job at a time unless --jobs says otherwise
+    if cuda_available():
+        return 1
+    return max(1, (os.cpu_count() or 1) // THREADS_PER_JOB)
+
+class LoadThrottle:
+    """Limit how many jobs may start at once, adjusted to the current CPU/RAM load.
+
+    The limit starts at min_workers and moves by one every LOAD_SAMPLE_SECONDS
+    between min_workers and max_workers. Running jobs are never interrupted;
+    a lower limit only delays the start of the next one.
+    """
+
+    def __init__(self, max_workers, min_workers=1):
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.limit = min_workers
+        self.active = 0
+        self._cond = threading.Condition()
+        self._stopped = threading.Event()
+        self._monitor = threading.Thread(target=self._adjust_loop, daemon=True)
+
+    def start(self):
+        psutil.cpu_percent(interval=None)  # Prime the CPU counters
+        self._monitor.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def acquire(self):
+        with self._cond:
+            while self.active >= self.limit:
+                self._cond.wait()
+            self.active += 1
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def _adjust_loop(self):
+        while not self._stopped.wait(LOAD_SAMPLE_SECONDS):
+            cpu = psutil.cpu_percent(interval=None)
+            mem = psutil.virtual_memory().percent
+            with self._cond:
+                old_limit = self.limit
+                if cpu > CPU_HIGH_PERCENT or mem > MEM_HIGH_PERCENT:
+                    self.limit = max(self.min_workers, self.limit - 1)
+                elif cpu < CPU_LOW_PERCENT and mem < MEM_HIGH_PERCENT:
+                    self.limit = min(self.max_workers, self.limit + 1)
+                if self.limit != old_limit:
+                    log(f"Load CPU {cpu:.0f}% / RAM {mem:.0f}%: concurrency limit {old_limit} -> {self.limit}")
+                    self._cond.notify_all()
+
+def has_content(path):
+    return os.path.exists(path) and os.path.getsize(path) > 0
+
+def already_transcribed(f, language, want_summary):
+    # Same check the transcriber does before exiting early, done here so no child is spawned
+    _, good_transcript_path, summary_path, _ = output_paths(*output_base(f), language)
+    if not has_content(good_transcript_path):
+        return False
+    return has_content(summary_path) if want_summary else True
+
+def job_log_path(f):
+    return os.path.splitext(f)[0] + ".transcribe.log"
+
+def run_one(cmd, job_log, throttle=None):
+    # Runs in a worker thread; the heavy lifting happens in the child process
+    if throttle:
+        throttle.acquire()
+    try:
+        return _run_child(cmd, job_log)
+    finally:
+        if throttle:
+            throttle.release()
+
+def drop_from_page_cache(fd):
+    # Job logs are rarely read back; keep the page cache for the video files instead (Linux only)
+    if not hasattr(os, "posix_fadvise"):
         return
+    try:
+        os.fdatasync(fd)  # Dirty pages cannot be dropped, so write them out first
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    except OSError:
+        pass
+
+def _run_child(cmd, job_log):
+    # close_fds=False with an absolute executable lets CPython launch the child
+    # via posix_spawn instead of fork+exec; Python's own fds are non-inheritable anyway
+    start_time = time.time()
+    if job_log is None:
+        # For verbose mode, show real-time output
+        returncode = subprocess.run(cmd, close_fds=False, timeout=JOB_TIMEOUT).returncode
+    else:
+        # Stream output straight to disk instead of holding it all in memory
+        with open(job_log, "wb") as lf:
+            try:
+                returncode = subprocess.run(cmd, stdout=lf, stderr=subprocess.STDOUT, close_fds=False, timeout=JOB_TIMEOUT).returncode
+            finally:
+                drop_from_page_cache(lf.fileno())
+    return returncode, time.time() - start_time
+
+def read_log_tail(path, max_bytes=LOG_TAIL_BYTES):
+    with open(path, "rb") as lf:
+        lf.seek(0, os.SEEK_END)
+        lf.seek(max(0, lf.tell() - max_bytes))
+        return lf.read().decode("utf-8", errors="replace")
+
+def _load_transcriber():
+    try:
+        from . import conversation_transcriber
+    except ImportError:
+        import conversation_transcriber  # Running as a plain script
+    return conversation_transcriber
+
+def _init_worker(vad_only=False):
+    # Load the diarization pipeline once per worker; every file this worker handles reuses it
+    transcriber = _load_transcriber()
+    if transcriber.HF_TOKEN is None:
+        raise RuntimeError("HF_TOKEN is not set. Please check your .env file.")
+    transcriber.load_diarization_pipeline(transcriber.HF_TOKEN, vad_only)
+
+def transcribe_in_worker(f, args):
+    transcriber = _load_transcriber()
+    start_time = time.time()
+    _, options = transcriber.parse_options([SCRIPT, f] + args)
+    transcriber.transcribe_file(f, **options)
+    return 0, time.time() - start_time
+
+def probe_duration(path):
+    result = subprocess.run(["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path],
+                            capture_output=True, text=True, check=True)
+    return float(result.stdout.strip())
+
+def split_recording(f, split_seconds):
+    """Cut the audio of f into chunks of about split_seconds without re-encoding.
+
+    Returns the chunk directory and a list of (chunk_path, start_seconds).
+    """
+    chunk_dir = os.path.splitext(f)[0] + ".chunks"
+    os.makedirs(chunk_dir, exist_ok=True)
+    segment_list = os.path.join(chunk_dir, "chunks.csv")
+    subprocess.run(["ffmpeg", "-y", "-v", "error", "-i", f, "-vn", "-map", "0:a:0", "-c", "copy",
+                    "-f", "segment", "-segment_time", str(split_seconds), "-reset_timestamps", "1",
+                    "-segment_list", segment_list, "-segment_list_type", "csv",
+                    os.path.join(chunk_dir, "chunk_%03d" + os.path.splitext(f)[1])],
+                   check=True, capture_output=True)
+    with open(segment_list, newline="", encoding="utf-8") as sl:
+        chunks = [(os.path.join(chunk_dir, row[0]), float(row[1])) for row in csv.reader(sl) if row]
+    return chunk_dir, chunks
+
+def stitch_chunk_transcripts(f, chunks, language):
+    # Shift each chunk's timestamps by the chunk start and join them into f's raw transcript
+    lines = []
+    for chunk_path, offset in chunks:
+        chunk_raw_path = output_paths(*output_base(chunk_path), language)[0]
+        with open(chunk_raw_path, "r", encoding="utf-8") as rf:
+            for line in rf.read().splitlines():
+                match = TRANSCRIPT_LINE_RE.match(line)
+                if match:
+                    speaker, start, end, text = match.groups()
+                    line = f"Speaker {speaker}: [{float(start) + offset:.2f}-{float(end) + offset:.2f}] {text}"
+                lines.append(line)
+    raw_transcript_path = output_paths(*output_base(f), language)[0]
+    write_output(raw_transcript_path, "\n".join(lines))
+
+def transcribe_in_chunks(files, split_minutes, language, jobs, throttle, verbose, force, extra_args=()):
+    """Transcribe recordings longer than split_minutes as chunks in parallel.
+
+    Only produces raw transcripts; the regular per-file run then picks them up
+    for refinement, summaries, subtitles and renaming. Returns the set of files
+    that now have a stitched raw transcript.
+    """
+    split_seconds = split_minutes * 60
+    chunk_args = ["--no-refine", "--lang", language] + (["--verbose"] if verbose else []) + list(extra_args)
+    split_files = {}
+    for f in files:
+        if not force and has_content(output_paths(*output_base(f), language)[0]):
+            continue
+        try:
+            if probe_duration(f) <= split_seconds:
+                continue
+            split_files[f] = split_recording(f, split_seconds)
+        except (subprocess.CalledProcessError, ValueError, OSError) as e:
+            log(f"WARNING: Could not split {f}, it will be transcribed whole: {e}")
+            continue
+        log(f"Split {f} into {len(split_files[f][1])} chunks of up to {split_minutes} min")
+    if not split_files:
+        return set()
+
+    stitched = set()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {}
+        for f, (_, chunks) in split_files.items():
+            for chunk_path, _ in chunks:
+                cmd = [sys.executable, SCRIPT, chunk_path] + chunk_args
+                job_log = None if verbose else job_log_path(chunk_path)
+                futures[executor.submit(run_one, cmd, job_log, throttle)] = (f, chunk_path)
+        failed_files = set()
+        for future in as_completed(futures):
+            f, chunk_path = futures[future]
+            try:
+                returncode, elapsed = future.result()
+            except Exception as e:
+                log(f"EXCEPTION: {chunk_path}: {e}")
+                failed_files.add(f)
+                continue
+            if returncode == 0:
+                log(f"SUCCESS: {chunk_path} (took {elapsed:.1f}s)")
+            else:
+                log(f"FAIL: {chunk_path} (took {elapsed:.1f}s)")
+                job_log = None if verbose else job_log_path(chunk_path)
+                if job_log and os.path.exists(job_log):
+                    log(f"OUTPUT (last {LOG_TAIL_BYTES} bytes):\n{read_log_tail(job_log)}")
+                failed_files.add(f)
+
+    for f, (chunk_dir, chunks) in split_files.items():
+        if f in failed_files:
+            log(f"WARNING: Some chunks of {f} failed, it will be transcribed whole")
+        else:
+            stitch_chunk_transcripts(f, chunks, language)
+            log(f"Stitched raw transcript of {f} from {len(chunks)} chunks")
+            stitched.add(f)
+        shutil.rmtree(chunk_dir, ignore_errors=True)
+    return stitched
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="batch_transcribe.py",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""EXAMPLES:
+  python3 ~/projects/conversation_transcriber/batch_transcribe.py
+  python3 ~/projects/conversation_transcriber/batch_transcribe.py . --verbose
+  python3 ~/projects/conversation_transcriber/batch_transcribe.py ~/Videos --lang zh --no-refine
+  python3 ~/projects/conversation_transcriber/batch_transcribe.py ~/Videos --summary  # With summaries
+  python3 ~/projects/conversation_transcriber/batch_transcribe.py ~/Videos --long_summary_prompt custom_prompt.txt
+  python3 ~/projects/conversation_transcriber/batch_transcribe.py ~/Videos --rename  # Auto-rename all files
+  python3 ~/projects/conversation_transcriber/batch_transcribe.py ~/Videos --rename Interview_Series  # With prefix
+  python3 ~/projects/conversation_transcriber/batch_transcribe.py ~/Videos --jobs 2  # Two files at a time
+  python3 ~/projects/conversation_transcriber/batch_transcribe.py ~/Videos --jobs 4 --split-minutes 10
+  python3 ~/projects/conversation_transcriber/batch_transcribe.py ~/Videos  # Uses English (default)""",
+    )
+    parser.add_argument("target_dir", nargs="?", default=os.getcwd(), metavar="TARGET_DIRECTORY",
+                        help="Directory containing video files (default: current directory)")
+    parser.add_argument("--no-refine", action="store_true", help="Skip transcript refinement (faster)")
+    parser.add_argument("--summary", action="store_true", help="Generate conversation summaries")
+    parser.add_argument("--verbose", action="store_true", help="Show detailed progress")
+    parser.add_argument("--force", action="store_true", help="Overwrite existing output files")
+    parser.add_argument("--lang", metavar="LANG",
+                        help=f"Specify language (default: en, options: {', '.join(l for l in VALID_LANGUAGES if l != 'en')})")
+    parser.add_argument("--long_summary_prompt", metavar="FILE", help="Use custom prompt file for summary generation")
+    parser.add_argument("--rename", nargs="?", const="", default=None, metavar="PREFIX",
+                        help="Auto-rename files based on content summary (includes summary generation)")
+    parser.add_argument("--whisper-backend", choices=("auto", "whispercpp", "faster-whisper", "mlx"), metavar="NAME",
+                        help="Whisper engine: auto (default), whispercpp, faster-whisper or mlx")
+    parser.add_argument("--whisper-model", metavar="NAME",
+                        help="Whisper model name or whisper.cpp model file (default: large-v3, large-v3-q5_0 on whisper.cpp)")
+    parser.add_argument("--whisper-workers", type=positive_int, metavar="N",
+                        help="Windows transcribed in parallel within each file (default: 1)")
+    parser.add_argument("--vad-only", action="store_true",
+                        help="Detect speech without telling speakers apart (faster, every line is Speaker 00)")
+    parser.add_argument("--diarize-chunk-minutes", type=positive_int, metavar="N",
+                        help="Diarize recordings longer than N minutes in N-minute chunks, matching speakers by voice")
+    parser.add_argument("--batch-api", action="store_true",
+                        help="Send refinement and summary requests through the OpenAI Batch API (half price, slower)")
+    parser.add_argument("--jobs", type=positive_int, metavar="N",
+                        help="Maximum number of files to process in parallel (default: 1 with an NVIDIA GPU, "
+                             f"else CPU cores / {THREADS_PER_JOB})")
+    parser.add_argument("--no-throttle", action="store_true",
+                        help="Always run --jobs files at once instead of adapting to CPU/RAM load")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Transcribe in long-lived worker processes that load the models once")
+    parser.add_argument("--split-minutes", type=positive_int, metavar="N",
+                        help="Transcribe recordings longer than N minutes as N-minute chunks in parallel "
+                             "(speaker numbers are assigned per chunk)")
+    options = parser.parse_args(argv)
+    # "--rename ~/Videos" would take the directory as the prefix and process the current directory
+    if options.rename and os.path.exists(options.rename):
+        parser.error(f"--rename prefix '{options.rename}' is an existing path; put TARGET_DIRECTORY before --rename")
+    return options
+
+def main():
+    setup_logging()
+
+    options = parse_args()
     
     if not check_script_exists():
         return
     
-    # Get target directory from command line or use current directory
-    target_dir = os.getcwd()  # Default to current directory
-    
-    # Parse arguments to find target directory (first non-flag argument that's not a language value, prompt file, or rename prefix)
-    for i, arg in enumerate(sys.argv[1:], 1):
-        if not arg.startswith('--'):
-            # Check if this is a language value (following --lang)
-            if i > 1 and sys.argv[i-1] == '--lang':
-                continue  # Skip language values
-            # Check if this is a prompt file (following --long_summary_prompt)
-            if i > 1 and sys.argv[i-1] == '--long_summary_prompt':
-                continue  # Skip prompt file values
-            # Check if this is a rename prefix (following --rename)
-            if i > 1 and sys.argv[i-1] == '--rename':
-                continue  # Skip rename prefix values
-            # This is the target directory
-            target_dir = arg
-            if not os.path.exists(target_dir):
-                log(f"ERROR: Target directory '{target_dir}' does not exist!")
-                return
-            break
+    target_dir = options.target_dir
+    if not os.path.exists(target_dir):
+        log(f"ERROR: Target directory '{target_dir}' does not exist!")
+        return
     
     log(f"Target directory: {target_dir}")
     
-    # Find video files in the target directory
-    files = sorted(glob.glob(os.path.join(target_dir, "*.mov")) + glob.glob(os.path.join(target_dir, "*.mp4")))
+    # Find video files in the target directory (one directory scan, skipping hidden/temp files)
+    with os.scandir(target_dir) as it:
+        entries = [
+            entry for entry in it
+            if entry.is_file() and not entry.name.startswith('.') and os.path.splitext(entry.name)[1].lower() in VIDEO_EXTS
+        ]
+    # Largest files first, so a big recording never starts last and runs alone at the end of a parallel batch
+    entries.sort(key=lambda entry: (-entry.stat().st_size, entry.path))
+    files = [entry.path for entry in entries]
     
     if not files:
         log("No .mov or .mp4 files found in target directory.")
@@ -89,131 +416,194 @@ def main():
     
     log(f"Batch processing started. Found {len(files)} files.")
     
-    # Check for command line options
+    # Build the transcriber arguments once from the parsed options
     args = []
-    if "--no-refine" in sys.argv:
+    if options.no_refine:
         args.append("--no-refine")
         log("Using --no-refine mode (faster processing)")
-    if "--summary" in sys.argv:
+    if options.summary:
         args.append("--summary")
         log("Using --summary mode (generating summaries)")
-    if "--verbose" in sys.argv:
+    if options.verbose:
         args.append("--verbose")
         log("Using --verbose mode (detailed output)")
-    if "--force" in sys.argv:
+    if options.force:
         args.append("--force")
         log("Using --force mode (overwrite existing files)")
-    if "--lang" in sys.argv:
-        lang_index = sys.argv.index("--lang")
-        if lang_index + 1 < len(sys.argv) and not sys.argv[lang_index + 1].startswith("--"):
-            lang_code = sys.argv[lang_index + 1]
-            # Validate language code
-            valid_languages = ['zh', 'en', 'ja', 'ko', 'fr', 'de', 'es', 'it', 'pt', 'ru']
-            if lang_code in valid_languages:
-                args.extend(["--lang", lang_code])
-                log(f"Using language: {lang_code}")
-            else:
-                print(f"\nERROR: Invalid language code '{lang_code}'")
-                print(f"Valid language options: {', '.join(valid_languages)}")
-                print("\nPlease choose an option:")
-                print("1. Enter a valid language code")
-                print("2. Continue without --lang (use English default)")
-                print("3. Exit")
-                
-                while True:
-                    choice = input("\nEnter your choice (1/2/3): ").strip()
-                    if choice == "1":
-                        new_lang = input("Enter valid language code: ").strip().lower()
-                        if new_lang in valid_languages:
-                            args.extend(["--lang", new_lang])
-                            log(f"Using corrected language: {new_lang}")
-                            break
-                        else:
-                            print(f"Invalid language code '{new_lang}'. Please try again.")
-                    elif choice == "2":
-                        log("Continuing with English as default language.")
+    if options.lang is not None:
+        lang_code = options.lang
+        # Validate language code
+        if lang_code in VALID_LANGUAGES:
+            args.extend(["--lang", lang_code])
+            log(f"Using language: {lang_code}")
+        else:
+            print(f"\nERROR: Invalid language code '{lang_code}'")
+            print(f"Valid language options: {', '.join(VALID_LANGUAGES)}")
+            print("\nPlease choose an option:")
+            print("1. Enter a valid language code")
+            print("2. Continue without --lang (use English default)")
+            print("3. Exit")
+            
+            while True:
+                choice = input("\nEnter your choice (1/2/3): ").strip()
+                if choice == "1":
+                    new_lang = input("Enter valid language code: ").strip().lower()
+                    if new_lang in VALID_LANGUAGES:
+                        args.extend(["--lang", new_lang])
+                        log(f"Using corrected language: {new_lang}")
                         break
-                    elif choice == "3":
-                        log("Exiting batch processing.")
-                        return
                     else:
-                        print("Invalid choice. Please enter 1, 2, or 3.")
-        else:
-            log("WARNING: --lang specified but no language given. Using English as default.")
-    if "--long_summary_prompt" in sys.argv:
-        lsp_index = sys.argv.index("--long_summary_prompt")
-        if lsp_index + 1 < len(sys.argv) and not sys.argv[lsp_index + 1].startswith("--"):
-            prompt_file = sys.argv[lsp_index + 1]
-            if not os.path.exists(prompt_file):
-                log(f"ERROR: Custom long summary prompt file '{prompt_file}' not found!")
-                return
-            args.extend(["--long_summary_prompt", prompt_file])
-            log(f"Using custom long summary prompt file: {prompt_file}")
-        else:
-            log("WARNING: --long_summary_prompt specified but no file given. Skipping custom prompt.")
-    if "--rename" in sys.argv:
+                        print(f"Invalid language code '{new_lang}'. Please try again.")
+                elif choice == "2":
+                    log("Continuing with English as default language.")
+                    break
+                elif choice == "3":
+                    log("Exiting batch processing.")
+                    return
+                else:
+                    print("Invalid choice. Please enter 1, 2, or 3.")
+    if options.long_summary_prompt is not None:
+        prompt_file = options.long_summary_prompt
+        if not os.path.exists(prompt_file):
+            log(f"ERROR: Custom long summary prompt file '{prompt_file}' not found!")
+            return
+        args.extend(["--long_summary_prompt", prompt_file])
+        log(f"Using custom long summary prompt file: {prompt_file}")
+    if options.whisper_backend is not None:
+        args.extend(["--whisper-backend", options.whisper_backend])
+        log(f"Using whisper backend: {options.whisper_backend}")
+    if options.whisper_model is not None:
+        args.extend(["--whisper-model", options.whisper_model])
+        log(f"Using whisper model: {options.whisper_model}")
+    if options.whisper_workers is not None:
+        args.extend(["--whisper-workers", str(options.whisper_workers)])
+    if options.vad_only:
+        args.append("--vad-only")
+        log("Using --vad-only mode (speech detection without speaker diarization)")
+    if options.diarize_chunk_minutes is not None:
+        args.extend(["--diarize-chunk-minutes", str(options.diarize_chunk_minutes)])
+    if options.batch_api:
+        args.append("--batch-api")
+        log("Using the OpenAI Batch API for refinement and summaries")
+    if options.rename is not None:
         args.append("--rename")
         log("Using --rename mode (auto-rename files based on content)")
-        # Parse rename prefix if provided
-        rename_index = sys.argv.index("--rename")
-        if rename_index + 1 < len(sys.argv) and not sys.argv[rename_index + 1].startswith("--"):
-            rename_prefix = sys.argv[rename_index + 1]
-            args.append(rename_prefix)
-            log(f"Using rename prefix: {rename_prefix}")
+        if options.rename:
+            args.append(options.rename)
+            log(f"Using rename prefix: {options.rename}")
 
+    # Skip files whose outputs already exist (the child would exit right away anyway)
+    skipped = 0
+    language = args[args.index("--lang") + 1] if "--lang" in args else "en"
+    if not options.force and options.rename is None:
+        want_summary = options.summary
+        pending = []
+        for f in files:
+            if already_transcribed(f, language, want_summary):
+                log(f"SKIP (already transcribed): {f}")
+                skipped += 1
+            else:
+                pending.append(f)
+        files = pending
+        if not files:
+            log(f"Batch processing complete. All {skipped} files already transcribed. Use --force to redo them.")
+            return
+
+    jobs = min(options.jobs or default_jobs(), len(files))
+    log(f"Processing up to {jobs} file(s) in parallel")
+
+    in_process = options.in_process
+    if in_process:
+        log("Using --in-process mode (models are loaded once per worker)")
+
+    # Grow/shrink the number of running jobs with the machine load
+    throttle = None
+    if jobs > 1 and not in_process and not options.no_throttle:
+        throttle = LoadThrottle(max_workers=jobs)
+        throttle.start()
+        log(f"Adaptive concurrency enabled (target CPU < {CPU_HIGH_PERCENT}%, RAM < {MEM_HIGH_PERCENT}%)")
+
+    # Language handling - English is default, but --lang can be specified
+    if "--lang" not in args:
+        log("Using English as default language. Use --lang to specify other languages.")
+
+    verbose = options.verbose
     successful = 0
     failed = 0
+
+    # Long recordings: transcribe chunks across all workers first, then run the normal pass on the result
+    stitched = set()
+    if options.split_minutes:
+        backend_args = ["--whisper-backend", options.whisper_backend] if options.whisper_backend else []
+        if options.whisper_model is not None:
+            backend_args += ["--whisper-model", options.whisper_model]
+        if options.whisper_workers is not None:
+            backend_args += ["--whisper-workers", str(options.whisper_workers)]
+        if options.vad_only:
+            backend_args.append("--vad-only")
+        stitched = transcribe_in_chunks(files, options.split_minutes, language, jobs, throttle, verbose, options.force,
+                                        backend_args)
+    # A stitched raw transcript is fresh, so those files must not redo it with --force
+    no_force_args = [a for a in args if a != "--force"]
     
-    for i, f in enumerate(files, 1):
-        log(f"({i}/{len(files)}) Processing: {f}")
-        start_time = time.time()
-        
-        try:
+    # Each subprocess job is its own child process, so threads are enough to keep N of them
+    # running. In-process jobs run in worker processes that keep the models loaded between files.
+    # All logging stays in this (main) thread.
+    if in_process:
+        executor = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                       initargs=(options.vad_only,))
+    else:
+        executor = ThreadPoolExecutor(max_workers=jobs)
+    with executor:
+        futures = {}
+        for i, f in enumerate(files, 1):
+            log(f"({i}/{len(files)}) Queued: {f}")
+            file_args = args
+            if f in stitched and options.force:
+                # Clear the old refined outputs so the run without --force regenerates them
+                for path in output_paths(*output_base(f), language)[1:]:
+                    if os.path.exists(path):
+                        os.remove(path)
+                file_args = no_force_args
+            if in_process:
+                futures[executor.submit(transcribe_in_worker, f, file_args)] = f
+                continue
             # Build command with absolute paths
-            cmd = ["python3", SCRIPT, f] + args
-            
-            # Language handling - English is default, but --lang can be specified
-            if "--lang" not in args:
-                log("Using English as default language. Use --lang to specify other languages.")
-            
-            # For verbose mode, show real-time output
-            if "--verbose" in args:
-                result = subprocess.run(
-                    cmd,
-                    timeout=12*3600  # 12h timeout in case of very large file
-                )
-            else:
-                result = subprocess.run(
-                    cmd,
-                    capture_output=True,
-                    text=True,
-                    timeout=12*3600  # 12h timeout in case of very large file
-                )
-            
-            elapsed = time.time() - start_time
-            
-            if result.returncode == 0:
-                log(f"SUCCESS: {f} (took {elapsed:.1f}s)")
-                successful += 1
-            else:
-                log(f"FAIL: {f} (took {elapsed:.1f}s)")
-                log(f"Return code: {result.returncode}")
-                # Only show captured output in non-verbose mode
-                if "--verbose" not in args:
-                    if hasattr(result, 'stdout') and result.stdout:
-                        log(f"STDOUT: {result.stdout}")
-                    if hasattr(result, 'stderr') and result.stderr:
-                        log(f"STDERR: {result.stderr}")
-                failed += 1
+            cmd = [sys.executable, SCRIPT, f] + file_args
+            job_log = None if verbose else job_log_path(f)
+            futures[executor.submit(run_one, cmd, job_log, throttle)] = f
+        
+        for future in as_completed(futures):
+            f = futures[future]
+            try:
+                returncode, elapsed = future.result()
+                job_log = None if verbose or in_process else job_log_path(f)
                 
-        except subprocess.TimeoutExpired:
-            log(f"TIMEOUT: {f} (exceeded 12 hours)")
-            failed += 1
-        except Exception as e:
-            log(f"EXCEPTION: {f}: {e}")
-            failed += 1
+                if returncode == 0:
+                    log(f"SUCCESS: {f} (took {elapsed:.1f}s)")
+                    successful += 1
+                    if job_log and os.path.exists(job_log):
+                        os.remove(job_log)
+                else:
+                    log(f"FAIL: {f} (took {elapsed:.1f}s)")
+                    log(f"Return code: {returncode}")
+                    # Only show captured output in non-verbose mode
+                    if job_log and os.path.exists(job_log):
+                        log(f"Full output: {job_log}")
+                        log(f"OUTPUT (last {LOG_TAIL_BYTES} bytes):\n{read_log_tail(job_log)}")
+                    failed += 1
+                    
+            except subprocess.TimeoutExpired:
+                log(f"TIMEOUT: {f} (exceeded 12 hours)")
+                failed += 1
+            except Exception as e:
+                log(f"EXCEPTION: {f}: {e}")
+                failed += 1
+    
+    if throttle:
+        throttle.stop()
     
-    log(f"Batch processing complete. Success: {successful}, Failed: {failed}")
+    log(f"Batch processing complete. Success: {successful}, Failed: {failed}, Skipped: {skipped}")
     
     if failed > 0:
         log("Some files failed. Check the log above for details.")
@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+
+# Results cache shared by all runs, keyed by the content of the input recording or of the request
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "conversation_transcriber")
+MAX_CACHE_BYTES = 1 << 30  # 1 GB, oldest entries are evicted first
+SAMPLE_BYTES = 1 << 20  # Bytes hashed from each end of a file
+# Entries of these kinds are recomputed once they are older than this many seconds.
+# LLM answers expire because model names like gpt-4o point at newer snapshots over time;
+# transcripts and diarization only depend on the recording and never expire.
+MAX_AGE = {"llm": 30 * 24 * 3600}
+
+def content_key(path):
+    """Fast fingerprint of a file: its size plus the first and last 1 MB (not the whole file)"""
+    size = os.path.getsize(path)
+    h = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(path, 'rb') as f:
+        h.update(f.read(SAMPLE_BYTES))
+        if size > 2 * SAMPLE_BYTES:
+            f.seek(size - SAMPLE_BYTES)
+            h.update(f.read(SAMPLE_BYTES))
+        else:
+            h.update(f.read())
+    return h.hexdigest()
+
+def request_key(*parts):
+    """Fingerprint of a request (e.g. model, messages and temperature of an LLM call)"""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def _entry_path(kind, key):
+    return os.path.join(CACHE_DIR, kind, f"{key}.json")
+
+def cache_load(kind, key):
+    path = _entry_path(kind, key)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    max_age = MAX_AGE.get(kind)
+    if max_age is not None and time.time() - data.get("created", 0) > max_age:
+        return None
+    # Mark as recently used (atime is unreliable on relatime/noatime mounts)
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return data
+
+def cache_store(kind, key, data):
+    path = _entry_path(kind, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # The file mtime tracks the last use for eviction, so the age is kept in the entry
+    data = dict(data, created=time.time())
+    # A temporary file of its own: several threads store answers at the same time
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    _count_stored(size)
+
+# Bytes in the cache as of the last scan plus what this process stored since (overwrites count twice,
+# which only makes the next scan come sooner); None until the first store scans the cache
+_cache_bytes = None
+_cache_bytes_lock = threading.Lock()
+
+def _count_stored(size):
+    global _cache_bytes
+    with _cache_bytes_lock:
+        if _cache_bytes is not None and _cache_bytes + size <= MAX_CACHE_BYTES:
+            _cache_bytes += size
+            return
+        # Scan (and evict) once per process, then again only when the counter passes the cap
+        _cache_bytes = evict_cache()
+
+def evict_cache(max_bytes=MAX_CACHE_BYTES):
+    # Drop least recently used entries until the cache fits in max_bytes; returns the bytes left
+    entries = []
+    total = 0
+    for root, _, names in os.walk(CACHE_DIR):
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+    return total
@@ -1,65 +1,142 @@
 import sys
 import os
+import argparse
+import json
 import subprocess
 import re
+import time
+import gc
+import math
+import functools
+import importlib.util
+import queue
+import threading
+import wave
+from concurrent.futures import ThreadPoolExecutor
 import openai
+import httpx
+import tiktoken
 from pyannote.audio import Pipeline
-from pydub import AudioSegment
+from pyannote.core import Annotation, Segment
+import soundfile as sf
+import numpy as np
 from datetime import datetime
 import torch
-from pywhispercpp.model import Model
 from dotenv import load_dotenv
 
+try:
+    import av  # Optional: in-process audio decoding (pip install conversation-transcriber[av])
+except ImportError:
+    av = None
+
+try:
+    from .outputs import output_base, output_paths, write_output
+    from .cache import content_key, request_key, cache_load, cache_store
+    from .whisper_backends import WHISPER_BACKENDS, resolve_whisper_backend, load_whisper_backends, release_whisper_backends
+    from .prompts import (CLEAN_SYSTEM_PROMPT, CLEAN_PROMPT_ZH, CLEAN_PROMPT_EN, SUMMARY_SYSTEM_PROMPT, SUMMARY_PROMPT_ZH,
+                          SUMMARY_PROMPT_EN, NOTES_PROMPT_ZH, NOTES_PROMPT_EN, FILENAME_SYSTEM_PROMPT,
+                          FILENAME_PROMPT_ZH, FILENAME_PROMPT_EN)
+except ImportError:
+    # Running as a plain script (e.g. launched by batch_transcribe)
+    from outputs import output_base, output_paths, write_output
+    from cache import content_key, request_key, cache_load, cache_store
+    from whisper_backends import WHISPER_BACKENDS, resolve_whisper_backend, load_whisper_backends, release_whisper_backends
+    from prompts import (CLEAN_SYSTEM_PROMPT, CLEAN_PROMPT_ZH, CLEAN_PROMPT_EN, SUMMARY_SYSTEM_PROMPT, SUMMARY_PROMPT_ZH,
+                         SUMMARY_PROMPT_EN, NOTES_PROMPT_ZH, NOTES_PROMPT_EN, FILENAME_SYSTEM_PROMPT,
+                         FILENAME_PROMPT_ZH, FILENAME_PROMPT_EN)
+
 # Load .env file
 load_dotenv()
 HF_TOKEN = os.getenv("HF_TOKEN")
-if HF_TOKEN is None:
-    print("Error: HF_TOKEN is not set. Please check your .env file.")
-    sys.exit(1)
 
-# Start timer
-start_time = datetime.now()
+SAMPLE_RATE = 16000  # Diarization and Whisper both work on 16 kHz mono audio
+# Opt-in: compile the diarization segmentation and embedding models with torch.compile (slow first start, faster inference)
+COMPILE_MODELS = os.getenv("COMPILE_MODELS", "").lower() in ("1", "true", "yes")
+# Opt-in: run the diarization models under float16 autocast on NVIDIA GPUs (faster, may shift speaker boundaries slightly)
+DIARIZATION_FP16 = os.getenv("DIARIZATION_FP16", "").lower() in ("1", "true", "yes")
+# Opt-in: full-precision Whisper weights on whisper.cpp instead of the quantized default
+HIGH_ACCURACY = os.getenv("HIGH_ACCURACY", "").lower() in ("1", "true", "yes")
+
+# Start timer (monotonic: cheap to read and unaffected by clock changes)
+start_time = time.monotonic()
 def elapsed():
-    delta = datetime.now() - start_time
-    return f"{delta.total_seconds():.1f}s"
+    return f"{time.monotonic() - start_time:.1f}s"
 
 def log(msg):
-    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] (+{elapsed()}) {msg}")
+    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] (+{elapsed()}) {msg}")
 
-def ensure_wav_mono_16k(input_path):
-    import wave
-    base, ext = os.path.splitext(input_path)
-    out_wav = base + "_16k_mono.wav"
-    
-    # Check if the expected WAV file already exists
-    if os.path.exists(out_wav):
-        log(f"Found existing WAV file at {out_wav}, using it.")
-        return out_wav, False  # False means we didn't create it
-    
-    # Check if input is already the right format
-    if ext.lower() == ".wav":
-        try:
-            with wave.open(input_path, 'rb') as wf:
-                if wf.getnchannels() == 1 and wf.getframerate() == 16000:
-                    return input_path, False  # False means we didn't create it
-        except Exception as e:
-            log(f"Warning: Could not check WAV format: {e}")
-    
-    # Convert to required format
-    log(f"Converting {input_path} to mono 16kHz WAV...")
+def is_wav_mono_16k(path):
+    """True for a 16-bit mono 16 kHz WAV file, which is read as is"""
+    try:
+        with wave.open(path, 'rb') as wf:
+            return wf.getnchannels() == 1 and wf.getframerate() == SAMPLE_RATE and wf.getsampwidth() == 2
+    except Exception as e:
+        log(f"Warning: Could not check WAV format: {e}")
+        return False
+
+def decode_audio_ffmpeg(input_path):
+    """Decode the audio to 16 kHz mono int16 samples with FFmpeg, piped straight into memory"""
+    log(f"Converting {input_path} to mono 16kHz with FFmpeg...")
     try:
-        subprocess.run(['ffmpeg', '-y', '-i', input_path, '-ar', '16000', '-ac', '1', out_wav], 
-                      check=True, capture_output=True, text=True)
-        return out_wav, True  # True means we created it
+        # -vn/-sn: only the audio stream is decoded, video and subtitle streams are skipped entirely
+        # Raw PCM goes to stdout instead of a temporary _16k_mono.wav that would be written and read back
+        result = subprocess.run(['ffmpeg', '-threads', '0', '-i', input_path, '-vn', '-sn', '-f', 's16le',
+                                 '-acodec', 'pcm_s16le', '-ar', str(SAMPLE_RATE), '-ac', '1', '-'],
+                                check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     except subprocess.CalledProcessError as e:
         log(f"FFmpeg conversion failed: {e}")
-        log(f"FFmpeg stderr: {e.stderr}")
+        # stderr is only decoded when it is actually needed
+        log(f"FFmpeg stderr: {e.stderr.decode('utf-8', errors='replace')}")
         raise
     except FileNotFoundError:
         log("Error: FFmpeg not found. Please install FFmpeg.")
         raise
+    return np.frombuffer(result.stdout, dtype=np.int16)
+
+def decode_audio_pyav(input_path):
+    """Decode the first audio stream to 16 kHz mono int16 samples in-process with PyAV"""
+    with av.open(input_path) as container:
+        stream = container.streams.audio[0]
+        resampler = av.AudioResampler(format='s16', layout='mono', rate=SAMPLE_RATE)
+        chunks = []
+        for frame in container.decode(stream):
+            for resampled in resampler.resample(frame):
+                chunks.append(resampled.to_ndarray().reshape(-1))
+        # Flush the samples still buffered in the resampler
+        for resampled in resampler.resample(None):
+            chunks.append(resampled.to_ndarray().reshape(-1))
+    return np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int16)
+
+def load_audio(input_path):
+    """Return the recording as 16 kHz mono int16 samples"""
+    base, ext = os.path.splitext(input_path)
+    # A 16 kHz WAV left by an earlier version (or made by hand) is read directly
+    wav_path = base + "_16k_mono.wav"
+    if os.path.exists(wav_path):
+        log(f"Found existing WAV file at {wav_path}, using it.")
+        return sf.read(wav_path, dtype='int16')[0]
+    if ext.lower() == ".wav" and is_wav_mono_16k(input_path):
+        return sf.read(input_path, dtype='int16')[0]
+
+    # Decode in-process when PyAV is installed
+    if av is not None:
+        log(f"Decoding {input_path} to mono 16kHz with PyAV...")
+        try:
+            return decode_audio_pyav(input_path)
+        except Exception as e:
+            log(f"PyAV decoding failed ({e}), falling back to FFmpeg")
+    return decode_audio_ffmpeg(input_path)
+
+# Held while a model loads, so threads transcribing at the same time share one copy
+_pipeline_lock = threading.Lock()
+
+def load_diarization_pipeline(token, vad_only=False):
+    with _pipeline_lock:
+        return _load_diarization_pipeline(token, vad_only)
 
-def load_diarization_pipeline(token):
+@functools.lru_cache(maxsize=1)
+def _load_diarization_pipeline(token, vad_only=False):
+    # Cached: when several files are transcribed in one process the pipeline is loaded once
     # Enhanced device detection for all GPU types
     if torch.backends.mps.is_available():
         device = torch.device("mps")  # Apple Silicon/Intel Mac with Metal
@@ -71,126 +148,497 @@ def load_diarization_pipeline(token):
         device = torch.device("cpu")  # CPU fallback
         print(f"Using device: {device} (CPU)")
     
-    pipeline = Pipeline.from_pretrained("pyannote/speaker-diarization-3.1", use_auth_token=token)
+    if vad_only:
+        # Speech detection only: no speaker embeddings and no clustering
+        pipeline = Pipeline.from_pretrained("pyannote/voice-activity-detection", use_auth_token=token)
+    else:
+        pipeline = Pipeline.from_pretrained("pyannote/speaker-diarization-3.1", use_auth_token=token)
     pipeline.to(device)
+    if device.type == "cuda":
+        # TF32 matmuls on Ampere and newer; the weights stay float32, since the pipeline
+        # feeds float32 audio to its models and .half() weights would not accept it
+        torch.set_float32_matmul_precision('high')
+    if COMPILE_MODELS:
+        compile_pipeline(pipeline, device)
     return pipeline
 
-def run_diarization_and_transcription(audio_file, pipeline, whisper_model_path="large-v3", verbose=False, language=None):
-    diarization = pipeline(audio_file)
+def release_models():
+    """Free the diarization pipeline and Whisper models once no more audio will be transcribed"""
+    with _pipeline_lock:
+        _load_diarization_pipeline.cache_clear()
+    release_whisper_backends()
+    gc.collect()
+    # Hand the cached GPU memory back as well, not just the Python objects
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+    elif torch.backends.mps.is_available():
+        torch.mps.empty_cache()
+    log("Released transcription models")
+
+def compile_pipeline(pipeline, device):
+    """Compile the segmentation and speaker embedding models with torch.compile.
+
+    The segmentation model is warmed up so the first file doesn't pay for it; the embedding
+    model sees varying batch sizes and is compiled on first use.
+    """
+    if device.type == "cuda":
+        compile_options = {"mode": "reduce-overhead"}
+    elif device.type == "mps":
+        compile_options = {"backend": "aot_eager"}  # Inductor does not generate MPS kernels
+    else:
+        compile_options = {}
+    segmentation = pipeline._segmentation
+    log(f"Compiling the segmentation model ({compile_options or 'default options'})...")
+    segmentation.model = torch.compile(segmentation.model, **compile_options)
+    try:
+        duration = segmentation.model.specifications.duration
+        # Same shape as pyannote's Inference will use, or the first file recompiles (and records a new CUDA graph)
+        with torch.inference_mode():
+            segmentation.model(torch.zeros(segmentation.batch_size, 1, int(duration * SAMPLE_RATE), device=device))
+        log("Segmentation model compiled")
+    except Exception as e:
+        log(f"Warning: segmentation model warm-up failed, it will be compiled on first use: {e}")
+    # Not there in the voice activity detection pipeline
+    embedding = getattr(getattr(pipeline, "_embedding", None), "model_", None)
+    if isinstance(embedding, torch.nn.Module):
+        log("Compiling the speaker embedding model...")
+        pipeline._embedding.model_ = torch.compile(embedding, **compile_options)
+
+WHISPER_MODEL = "large-v3"
+# whisper.cpp on the CPU is limited by memory bandwidth: 5-bit weights read ~3x fewer bytes than float16
+# (faster-whisper and mlx already run quantized weights)
+WHISPERCPP_MODEL = "large-v3-q5_0"
+MIN_TURN_SECONDS = 0.5  # Shorter diarization turns are not transcribed
+TURN_COLLAR_SECONDS = 0.5  # Same-speaker turns closer than this are merged
+
+# Whisper's encoder always processes a 30 s window, so shorter clips cost as much as a full one
+WHISPER_WINDOW_SECONDS = 30
+
+def default_whisper_model(whisper_backend):
+    """Model used when --whisper-model is not given, for a resolved backend name"""
+    if whisper_backend == 'whispercpp' and not HIGH_ACCURACY:
+        return WHISPERCPP_MODEL
+    return WHISPER_MODEL
+
+def group_turns(segments_list, window_seconds=WHISPER_WINDOW_SECONDS):
+    """Group consecutive turns of the same speaker into windows spanning at most window_seconds.
+
+    A window never mixes speakers: Whisper segments often run across a speaker change, and a
+    segment can only be given to one turn, so a short reply would be merged into the other speaker's turn.
+    """
+    windows = []
+    for item in segments_list:
+        turn, speaker = item[0], item[2]
+        if (windows and speaker == windows[-1][-1][2]
+                and turn.end - windows[-1][0][0].start <= window_seconds):
+            windows[-1].append(item)
+        else:
+            windows.append([item])
+    return windows
+
+def split_long_turns(turns, max_seconds=WHISPER_WINDOW_SECONDS):
+    """Cut (turn, track, speaker) items longer than max_seconds into equal pieces of at most max_seconds.
+
+    Returns (piece, index of its turn, speaker) items: Whisper only hears 30 s at a time, and faster-whisper's
+    batches cut anything longer, so a monologue is transcribed piece by piece and its text joined again.
+    """
+    pieces = []
+    for index, (turn, _, speaker) in enumerate(turns):
+        count = math.ceil(turn.duration / max_seconds)
+        step = turn.duration / count
+        for k in range(count):
+            end = turn.end if k == count - 1 else turn.start + (k + 1) * step
+            pieces.append((Segment(turn.start + k * step, end), index, speaker))
+    return pieces
+
+def assign_to_turns(whisper_segments, window_start, turns):
+    """Map whisper segments (times relative to window_start) to the turn they overlap most"""
+    texts = [[] for _ in turns]
+    for seg in whisper_segments:
+        text = seg.text.strip()
+        if not text:
+            continue
+        seg_start = window_start + seg.start
+        seg_end = window_start + seg.end
+        overlaps = [min(seg_end, turn.end) - max(seg_start, turn.start) for turn in turns]
+        best = max(range(len(turns)), key=lambda k: overlaps[k])
+        if overlaps[best] <= 0:
+            # No overlap (e.g. text placed in a gap): use the nearest turn
+            middle = (seg_start + seg_end) / 2
+            best = min(range(len(turns)), key=lambda k: abs((turns[k].start + turns[k].end) / 2 - middle))
+        texts[best].append(text)
+    return [" ".join(t) for t in texts]
+
+# Speakers of different chunks whose embeddings are closer than this (cosine distance) are the same person;
+# close to the threshold pyannote 3.1 clusters with inside one chunk
+SPEAKER_LINK_MAX_DISTANCE = 0.7
+# Chunks overlap by this much so speakers talking across a boundary can be matched by their turns
+CHUNK_OVERLAP_SECONDS = 5
+# Speakers of neighbouring chunks who talk together this long inside the overlap are the same person
+SPEAKER_LINK_MIN_OVERLAP_SECONDS = 1
+
+def diarize(samples, pipeline, chunk_seconds=None):
+    """Diarize int16 samples; recordings longer than chunk_seconds are diarized in chunks"""
+    if chunk_seconds and len(samples) > chunk_seconds * SAMPLE_RATE:
+        diarization = diarize_in_chunks(samples, pipeline, chunk_seconds)
+    else:
+        diarization = run_pipeline(samples, pipeline)
     log("Speaker diarization done")
+    return diarization
+
+def run_pipeline(samples, pipeline, **kwargs):
+    # pyannote takes the waveform in memory as a (channel, time) float tensor
+    waveform = torch.from_numpy(samples.astype(np.float32) / 32768.0).unsqueeze(0)
+    # inference_mode: no autograd bookkeeping for the segmentation and embedding passes;
+    # autocast runs their matmuls and convolutions in float16 while the audio stays float32
+    with torch.inference_mode(), torch.autocast("cuda", dtype=torch.float16,
+                                                enabled=DIARIZATION_FP16 and torch.cuda.is_available()):
+        return pipeline({"waveform": waveform, "sample_rate": SAMPLE_RATE}, **kwargs)
 
-    audio = AudioSegment.from_wav(audio_file)
-    whisper_model = Model(whisper_model_path)
+def diarize_in_chunks(samples, pipeline, chunk_seconds):
+    """Diarize chunk_seconds pieces one after another, then give each speaker one label across all pieces.
+
+    Clustering cost grows with the square of the number of speech segments, so pieces are cheaper
+    than the whole. Each piece runs CHUNK_OVERLAP_SECONDS into the next: speakers talking in both
+    copies of the overlap are the same person, the others are matched by their embeddings, and each
+    piece keeps its turns up to the middle of the overlap. The pieces are not run in parallel:
+    pyannote does not support calling one pipeline from several threads.
+    """
+    chunk_samples = int(chunk_seconds * SAMPLE_RATE)
+    overlap_samples = int(CHUNK_OVERLAP_SECONDS * SAMPLE_RATE)
+    starts = range(0, len(samples), chunk_samples)
+    log(f"Diarizing {len(starts)} chunks of {chunk_seconds / 60:g} minutes...")
+    results = [run_pipeline(samples[start:start + chunk_samples + overlap_samples], pipeline, return_embeddings=True)
+               for start in starts]
+
+    merged = Annotation()
+    centroids = []  # Running sum of unit embeddings of every speaker found so far, index = speaker number
+    previous = []  # Turns of the previous chunk in recording time, with shared labels
+    for i, (start, (chunk_diarization, embeddings)) in enumerate(zip(starts, results)):
+        offset = start / SAMPLE_RATE
+        turns = [(Segment(turn.start + offset, turn.end + offset), track, label)
+                 for turn, track, label in chunk_diarization.itertracks(yield_label=True)]
+        known = match_overlap(previous, turns, Segment(offset, offset + CHUNK_OVERLAP_SECONDS))
+        mapping = link_speakers(chunk_diarization.labels(), embeddings, centroids, known)
+        previous = [(turn, track, mapping[label]) for turn, track, label in turns]
+
+        # Both chunks cover the overlap; the boundary between them is its middle
+        own_start = offset + CHUNK_OVERLAP_SECONDS / 2 if i else 0
+        own_end = offset + chunk_seconds + CHUNK_OVERLAP_SECONDS / 2
+        for turn, track, label in previous:
+            turn_start, turn_end = max(turn.start, own_start), min(turn.end, own_end)
+            if turn_end > turn_start:
+                merged[Segment(turn_start, turn_end), f"{i}_{track}"] = label
+    # Rejoin turns cut at a boundary
+    return merged.support()
+
+def match_overlap(previous, turns, overlap):
+    """Map labels of turns to the shared labels of previous whose speech they mostly coincide with inside overlap"""
+    shared = {}  # (label, shared label) -> seconds both speak inside the overlap
+    speech = {}  # label -> seconds it speaks inside the overlap
+    for turn, _, label in turns:
+        turn = turn & overlap
+        speech[label] = speech.get(label, 0) + turn.duration
+        for previous_turn, _, previous_label in previous:
+            both = turn & previous_turn
+            if both:
+                shared[label, previous_label] = shared.get((label, previous_label), 0) + both.duration
+
+    known = {}
+    for (label, previous_label), seconds in sorted(shared.items(), key=lambda item: -item[1]):
+        # Short coincidences are overlapping speech, not the same voice
+        if (label not in known and previous_label not in known.values()
+                and seconds >= SPEAKER_LINK_MIN_OVERLAP_SECONDS and seconds >= speech[label] / 2):
+            known[label] = previous_label
+    return known
+
+def link_speakers(labels, embeddings, centroids, known=None):
+    """Map one chunk's speaker labels to SPEAKER_xx labels shared by all chunks, updating centroids.
+
+    known maps labels already matched to a shared label; centroids are running sums of unit
+    embeddings, which point the same way as their running means.
+    """
+    known = known or {}
+    mapping = {}
+    used = {int(shared.split("_")[1]) for shared in known.values()}
+    for label, embedding in zip(labels, embeddings):
+        # pyannote returns NaN embeddings for speakers with too little speech and
+        # zero-padded ones when it finds more speakers than clusters: neither can be compared
+        usable = not np.isnan(embedding).any() and np.linalg.norm(embedding) > 0
+        if usable:
+            embedding = embedding / np.linalg.norm(embedding)
+        best = int(known[label].split("_")[1]) if label in known else None
+        if best is None and usable:
+            best_distance = SPEAKER_LINK_MAX_DISTANCE
+            for k, centroid in enumerate(centroids):
+                if k in used or centroid is None:
+                    continue
+                distance = 1 - np.dot(embedding, centroid) / np.linalg.norm(centroid)
+                if distance < best_distance:
+                    best, best_distance = k, distance
+        if best is None:
+            # New speaker (or one without a usable embedding)
+            best = len(centroids)
+            centroids.append(None)
+        if usable:
+            centroids[best] = embedding if centroids[best] is None else centroids[best] + embedding
+        used.add(best)
+        mapping[label] = f"SPEAKER_{best:02d}"
+    return mapping
+
+def diarization_to_json(diarization):
+    return [[turn.start, turn.end, speaker] for turn, _, speaker in diarization.itertracks(yield_label=True)]
+
+def diarization_from_json(rows):
+    diarization = Annotation()
+    for i, (start, end, speaker) in enumerate(rows):
+        diarization[Segment(start, end), i] = speaker
+    return diarization
+
+def run_diarization_and_transcription(samples, pipeline=None, whisper_model_path=None, verbose=False, language=None,
+                                      whisper_backend='auto', diarization=None, whisper_workers=1):
+    """Diarize (unless a diarization is given) and transcribe 16 kHz mono int16 samples (see load_audio)
+
+    Returns the transcript text and its lines as (start, end, speaker, text) tuples.
+    """
+    if diarization is None:
+        diarization = diarize(samples, pipeline)
+
+    # Windows are slices of the int16 array, no per-window WAV files
+    sample_rate = SAMPLE_RATE
+    whisper_backend = resolve_whisper_backend(whisper_backend)
+    whisper_model_path = whisper_model_path or default_whisper_model(whisper_backend)
+    log(f"Using whisper backend: {whisper_backend} ({whisper_model_path})")
+    backends = load_whisper_backends(whisper_backend, whisper_model_path, whisper_workers)
     transcript_lines = []
-    segments_list = list(diarization.itertracks(yield_label=True))
-    log(f"Found {len(segments_list)} segments to transcribe.")
+    segments_out = []  # (start, end, speaker, text), the same content as transcript_lines
+    # Merge same-speaker turns split by short pauses, then drop turns too short for Whisper
+    # (sub-second clips are mostly noise and a common source of hallucinated text)
+    diarization = diarization.support(collar=TURN_COLLAR_SECONDS)
+    all_turns = list(diarization.itertracks(yield_label=True))
+    segments_list = [item for item in all_turns if item[0].duration >= MIN_TURN_SECONDS]
+    if len(segments_list) < len(all_turns):
+        log(f"Skipping {len(all_turns) - len(segments_list)} segments shorter than {MIN_TURN_SECONDS}s")
+    pieces = split_long_turns(segments_list)
+    # Transcribe neighbouring turns of a speaker together: one whisper pass per window instead of per turn
+    windows = group_turns(pieces)
+    log(f"Found {len(segments_list)} segments to transcribe in {len(windows)} windows.")
+    log(f"Using language: {language}")
 
-    # Initialize language detection variable
-    detected_lang = None
+    def window_audio(window):
+        turns = [turn for turn, _, _ in window]
+        window_start = turns[0].start
+        window_end = max(turn.end for turn in turns)
+        # Whisper expects float32 in [-1, 1]; only the windows are converted, not the gaps between them
+        clip = samples[int(window_start * sample_rate):int(window_end * sample_rate)].astype(np.float32) / 32768.0
+        return turns, window_start, clip
 
-    for i, (turn, _, speaker) in enumerate(segments_list):
+    def transcribe_batched(backend, shard):
+        # The backend decodes several windows per forward pass; None if that failed
+        audio = [window_audio(window) for window in shard]
+        texts = [[""] * len(window) for window in shard]
+        nonempty = [k for k, (_, _, clip) in enumerate(audio) if len(clip) > 0]
+        log(f"Transcribing {len(nonempty)} windows in batches...")
+        try:
+            segment_lists = backend.transcribe_clips([audio[k][2] for k in nonempty], language=language)
+        except Exception as e:
+            log(f"Error in batched transcription, transcribing window by window instead: {e}")
+            return None
+        for k, segments in zip(nonempty, segment_lists):
+            turns, window_start, _ = audio[k]
+            texts[k] = assign_to_turns(segments, window_start, turns)
+        return texts
+
+    # Otherwise windows are transcribed one per call; with several workers in parallel, each worker
+    # borrowing a model from the pool (the backends release the GIL during inference)
+    whisper_models = queue.Queue()
+    for model in backends:
+        whisper_models.put(model)
+
+    def transcribe_window(i, window):
         if verbose:
-            log(f"Transcribing segment {i+1} of {len(segments_list)}...")
-        start_ms = int(turn.start * 1000)
-        end_ms = int(turn.end * 1000)
-        segment = audio[start_ms:end_ms]
-        
-        # Use safer temporary file handling to avoid I/O errors
-        segment_file = None
-        text = ""
-        
+            log(f"Transcribing window {i+1} of {len(windows)} ({len(window)} segments)...")
+        turns, window_start, segment = window_audio(window)
+        texts = [""] * len(window)
+
+        whisper_model = whisper_models.get()
         try:
-            import tempfile
-            
-            # Create temporary file with proper cleanup
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-                segment_file = temp_file.name
-                segment.export(segment_file, format="wav")
-            
-            # Verify the file was created and has content
-            if os.path.exists(segment_file) and os.path.getsize(segment_file) > 0:
+            if len(segment) > 0:
                 # Use the specified language (defaults to English)
-                segments = whisper_model.transcribe(segment_file, language=language)
-                if i == 0:
-                    log(f"Using language: {language}")
-                
-                text = " ".join([seg.text.strip() for seg in segments if seg.text.strip()])
-            else:
-                log(f"Warning: Temporary file {segment_file} is empty or missing")
-            
+                segments = whisper_model.transcribe(segment, language=language)
+                texts = assign_to_turns(segments, window_start, turns)
         except Exception as e:
-            log(f"Error transcribing segment {i+1}: {e}")
-            text = ""
+            log(f"Error transcribing window {i+1}: {e}")
         finally:
-            # Always clean up the temporary file
-            if segment_file and os.path.exists(segment_file):
-                try:
-                    os.remove(segment_file)
-                except OSError as cleanup_error:
-                    log(f"Warning: Could not remove temp file {segment_file}: {cleanup_error}")
-        
+            whisper_models.put(whisper_model)
+        return texts
+
+    results = None
+    if hasattr(backends[0], "transcribe_clips"):
+        # With several workers (e.g. one per GPU) every worker gets an interleaved share of the windows
+        shards = [windows[k::len(backends)] for k in range(len(backends))]
+        with ThreadPoolExecutor(max_workers=len(backends)) as executor:
+            shard_texts = list(executor.map(transcribe_batched, backends, shards))
+        if all(texts is not None for texts in shard_texts):
+            results = [None] * len(windows)
+            for k, texts in enumerate(shard_texts):
+                results[k::len(backends)] = texts
+    if results is None:
+        with ThreadPoolExecutor(max_workers=len(backends)) as executor:
+            # map() yields in window order, so the transcript stays chronological
+            results = list(executor.map(transcribe_window, range(len(windows)), windows))
+    # Join the pieces of turns that were longer than one window
+    turn_texts = [[] for _ in segments_list]
+    for window, texts in zip(windows, results):
+        for (_, index, _), text in zip(window, texts):
+            if text:
+                turn_texts[index].append(text)
+    for (turn, _, speaker), texts in zip(segments_list, turn_texts):
+        text = " ".join(texts)
         if text:
-            line = f"Speaker {speaker.split('_')[-1]}: [{turn.start:.2f}-{turn.end:.2f}] {text}"
+            speaker_number = speaker.split('_')[-1]
+            line = f"Speaker {speaker_number}: [{turn.start:.2f}-{turn.end:.2f}] {text}"
             transcript_lines.append(line)
+            segments_out.append((turn.start, turn.end, speaker_number, text))
             if verbose:
                 print(line)
 
-    del whisper_model
     log("Whisper model transcribe done")
-    return "\n".join(transcript_lines)
+    return "\n".join(transcript_lines), segments_out
 
-def load_or_generate_transcript(input_file, raw_transcript_path, pipeline, verbose=False, language=None, force=False):
+def load_or_generate_transcript(input_file, raw_transcript_path, pipeline=None, verbose=False, language=None, force=False,
+                                whisper_backend='auto', whisper_workers=1, vad_only=False, whisper_model=None,
+                                diarize_chunk_minutes=None):
+    """Return the raw transcript text and its lines as (start, end, speaker, text) tuples"""
     if os.path.exists(raw_transcript_path) and not force:
         log(f"Found existing raw transcript at {raw_transcript_path}, skipping audio conversion, diarization, and transcription.")
         with open(raw_transcript_path, "r", encoding="utf-8") as f:
-            return f.read()
+            transcript = f.read()
+        return transcript, parse_transcript(transcript)
     else:
-        audio_file, was_created = ensure_wav_mono_16k(input_file)
-        transcript = run_diarization_and_transcription(audio_file, pipeline, verbose=verbose, language=language)
-        with open(raw_transcript_path, "w", encoding="utf-8") as f:
-            f.write(transcript)
-        # Only delete the WAV file if we created it
-        if was_created and audio_file.endswith("_16k_mono.wav") and os.path.exists(audio_file):
-            os.remove(audio_file)
-            log(f"Deleted temporary file: {audio_file}")
-        elif was_created:
-            log(f"Keeping WAV file: {audio_file}")
-        return transcript
-
-def clean_transcript(transcript, good_transcript_path):
-    # If transcript is very long, chunk it to avoid timeout
-    max_chars = 6000  # Conservative limit for transcript cleaning
-    if len(transcript) > max_chars:
-        log(f"Transcript is very long ({len(transcript)} chars), using chunking for cleaning")
-        # Split into chunks and process each
-        chunks = []
-        for i in range(0, len(transcript), max_chars):
-            chunk = transcript[i:i + max_chars]
-            chunks.append(chunk)
-        
-        cleaned_chunks = []
-        for i, chunk in enumerate(chunks):
-            log(f"Cleaning chunk {i+1} of {len(chunks)}...")
-            cleaned_chunk = clean_transcript_chunk(chunk)
-            cleaned_chunks.append(cleaned_chunk)
+        # Same recording transcribed before (possibly under another name) with the same Whisper model? Reuse that result.
+        mode = "_vad" if vad_only else ""
+        # Speech detection has no speakers (or embeddings) to link between chunks
+        chunk_seconds = diarize_chunk_minutes * 60 if diarize_chunk_minutes and not vad_only else None
+        if chunk_seconds:
+            # Speakers of a chunked diarization may be split across chunks: not the same result as a full one
+            mode += f"_chunk{diarize_chunk_minutes}"
+        whisper_backend = resolve_whisper_backend(whisper_backend)
+        whisper_model = whisper_model or default_whisper_model(whisper_backend)
+        # Hashed: the model may be a path to a ggml file
+        model_key = request_key(whisper_backend, whisper_model)[:16]
+        cache_key = f"{content_key(input_file)}_{language}{mode}_{model_key}"
+        cached = None if force else cache_load("transcripts", cache_key)
+        if cached is not None:
+            log(f"Found cached raw transcript for {input_file}, skipping audio conversion, diarization, and transcription.")
+            transcript = cached["raw_transcript"]
+            write_output(raw_transcript_path, transcript)
+            return transcript, parse_transcript(transcript)
+
+        # Speakers don't depend on the language: reuse an earlier diarization of this recording
+        diarization_key = content_key(input_file) + mode
+        cached_diarization = None if force else cache_load("diarization", diarization_key)
+        diarization = None
+        if cached_diarization is not None:
+            log("Found cached speaker diarization, skipping diarization.")
+            diarization = diarization_from_json(cached_diarization["turns"])
+
+        # Decode the audio in the background while the models load
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            decoding = executor.submit(load_audio, input_file)
+            if pipeline is None and diarization is None:
+                pipeline = load_diarization_pipeline(HF_TOKEN, vad_only)
+            load_whisper_backends(whisper_backend, whisper_model, whisper_workers)
+            samples = decoding.result()
+        if diarization is None:
+            diarization = diarize(samples, pipeline, chunk_seconds)
+            if vad_only:
+                # Speech regions carry no speaker identity: attribute every turn to one speaker
+                diarization = diarization.rename_labels({label: "SPEAKER_00" for label in diarization.labels()})
+            cache_store("diarization", diarization_key, {"turns": diarization_to_json(diarization)})
+        transcript, segments = run_diarization_and_transcription(samples, verbose=verbose, language=language,
+                                                                 whisper_backend=whisper_backend, diarization=diarization,
+                                                                 whisper_workers=whisper_workers, whisper_model_path=whisper_model)
+        write_output(raw_transcript_path, transcript)
+        cache_store("transcripts", cache_key, {"language": language, "raw_transcript": transcript})
+        return transcript, segments
+
+# Files whose refinement/summary stage may run at once while the next file is transcribed
+POSTPROCESS_WORKERS = 2
+# Maximum number of transcript chunks being cleaned by the API at the same time
+CLEAN_CONCURRENCY = 8
+# Prompt size limit per cleaning request, in tokens (keeps each request well under the timeout)
+CLEAN_TOKEN_BUDGET = 4000
+
+@functools.lru_cache(maxsize=1)
+def token_encoder():
+    # Tokenizer of the gpt-4.1 / gpt-4o model family
+    return tiktoken.get_encoding("o200k_base")
+
+def split_transcript(transcript, token_budget=CLEAN_TOKEN_BUDGET):
+    """Split a transcript on line boundaries into chunks of at most token_budget tokens"""
+    encoder = token_encoder()
+    chunks = []
+    current = []
+    current_tokens = 0
+    for line in transcript.split("\n"):
+        line_tokens = len(encoder.encode(line)) + 1  # +1 for the newline
+        # A single line over the budget still becomes its own chunk
+        if current and current_tokens + line_tokens > token_budget:
+            chunks.append("\n".join(current))
+            current = []
+            current_tokens = 0
+        current.append(line)
+        current_tokens += line_tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+def clean_transcript(transcript, good_transcript_path, force=False, batch_api=False, language=None,
+                     batch_deadline=None):
+    # If transcript is very long, chunk it (on line boundaries) to avoid timeout
+    chunks = split_transcript(transcript)
+    batched = [None] * len(chunks)
+    if batch_api:
+        # All chunks go into one Batch API job; chunks it did not answer are cleaned directly below
+        log(f"Cleaning {len(chunks)} chunk(s) through the Batch API...")
+        batched = batch_chat_completions([clean_chunk_request(chunk, language) for chunk in chunks],
+                                         use_cache=not force, deadline=batch_deadline)
+    if len(chunks) > 1:
+        log(f"Transcript is very long ({len(transcript)} chars), using {len(chunks)} chunks for cleaning")
+        # Chunks are independent, so send them to the API concurrently (map keeps their order)
+        log(f"Cleaning {len(chunks)} chunks, up to {CLEAN_CONCURRENCY} at a time...")
+        with ThreadPoolExecutor(max_workers=min(CLEAN_CONCURRENCY, len(chunks))) as executor:
+            cleaned_chunks = list(executor.map(
+                lambda chunk, answer: (answer.strip() if answer
+                                       else clean_transcript_chunk(chunk, force=force, language=language)),
+                chunks, batched))
         
-        good_transcript = "\n\n".join(cleaned_chunks)
+        good_transcript = "\n".join(cleaned_chunks)
+    elif batched[0]:
+        good_transcript = batched[0].strip()
     else:
-        good_transcript = clean_transcript_chunk(transcript)
+        good_transcript = clean_transcript_chunk(transcript, force=force, language=language)
     
-    with open(good_transcript_path, 'w', encoding='utf-8') as f:
-        f.write(good_transcript)
+    write_output(good_transcript_path, good_transcript)
     log(f"Refined transcript: {good_transcript_path}")
     return good_transcript
 
+# Word characters other than digits and underscore: the str.isalpha() letters plus the number characters
+# that are not decimal digits (Unicode No/Nl, e.g. ², ½, Ⅷ, 〇). Those are rare in transcripts and only
+# add to the denominator of the Chinese ratio, so the regex is close to isalpha() but not equal to it
+ALPHA_RE = re.compile(r'[^\W\d_]')
+
 def detect_language(text):
     """Simple language detection based on character sets"""
     if not text:
         return 'en'
     
-    # Count Chinese characters (CJK Unified Ideographs)
-    chinese_chars = sum(1 for char in text if '\u4e00' <= char <= '\u9fff')
-    total_chars = len([char for char in text if char.isalpha()])
+    # Count Chinese characters (CJK Unified Ideographs) as a range check over the code points,
+    # and letters as what the regex removes; neither builds a list of one-character matches
+    codepoints = np.frombuffer(text.encode('utf-32-le'), dtype='<u4')
+    chinese_chars = int(np.count_nonzero((codepoints >= 0x4e00) & (codepoints <= 0x9fff)))
+    total_chars = len(text) - len(ALPHA_RE.sub('', text))
     
     if total_chars == 0:
         return 'en'
@@ -202,31 +650,163 @@ def detect_language(text):
     else:
         return 'en'
 
-def clean_transcript_chunk(transcript_chunk):
-    # Detect language and create appropriate prompt
-    language = detect_language(transcript_chunk)
-    log(f"Detected language for this chunk: {language}")
+# Batch API jobs are polled this often. All jobs of one file together wait at most BATCH_MAX_WAIT_SECONDS
+# (requests not answered by then are sent directly), plus up to BATCH_CANCEL_WAIT_SECONDS for a cancel to finish
+BATCH_POLL_SECONDS = 30
+BATCH_MAX_WAIT_SECONDS = 30 * 60
+BATCH_CANCEL_WAIT_SECONDS = 2 * 60
+
+@functools.lru_cache(maxsize=1)
+def openai_client():
+    # One client for every OpenAI call in the run: kept-alive connections skip the TLS handshake per request,
+    # and with the http2 extra installed the concurrent cleaning requests share one multiplexed connection.
+    # Created on first use so importing this module leaves the openai package's own client alone
+    return openai.OpenAI(http_client=openai.DefaultHttpxClient(
+        http2=importlib.util.find_spec("h2") is not None,
+        limits=httpx.Limits(max_keepalive_connections=16, keepalive_expiry=60)))
+
+def batch_chat_completions(requests, use_cache=True, deadline=None):
+    """Run (model, messages, temperature) chat requests as one OpenAI Batch API job (half the price).
+
+    Returns the answers in request order; an answer is None when the job failed, did not finish
+    by deadline (a time.monotonic() value, default BATCH_MAX_WAIT_SECONDS from now), or had no
+    content for that request. Answers are cached like chat_completion's, so it finds them afterwards.
+    """
+    keys = [request_key(model, messages, temperature) for model, messages, temperature in requests]
+    answers = [None] * len(requests)
+    lines = []
+    for i, ((model, messages, temperature), key) in enumerate(zip(requests, keys)):
+        cached = cache_load("llm", key) if use_cache else None
+        if cached is not None:
+            answers[i] = cached["content"]
+        else:
+            lines.append(json.dumps({"custom_id": str(i), "method": "POST", "url": "/v1/chat/completions",
+                                     "body": {"model": model, "messages": messages, "temperature": temperature}}))
+    if not lines:
+        return answers
+    if deadline is None:
+        deadline = time.monotonic() + BATCH_MAX_WAIT_SECONDS
+    elif time.monotonic() >= deadline:
+        log(f"Batch API wait of {BATCH_MAX_WAIT_SECONDS // 60} minutes used up, not submitting another batch")
+        return answers
+
+    # Uploaded and generated files stay in the account's OpenAI storage until deleted
+    file_ids = []
+    batch = None
+    output = None
+    try:
+        client = openai_client()
+        batch_file = client.files.create(file=("requests.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch")
+        file_ids.append(batch_file.id)
+        batch = client.batches.create(input_file_id=batch_file.id, endpoint="/v1/chat/completions",
+                                      completion_window="24h")
+        log(f"Submitted {len(lines)} request(s) as batch {batch.id}, waiting for it to complete...")
+        cancelled = False
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            if time.monotonic() > deadline:
+                if cancelled:
+                    log(f"Warning: batch {batch.id} is still {batch.status}, its output files will not be deleted")
+                    break
+                log(f"Batch {batch.id} did not complete in time, cancelling it")
+                # Requests finished before the cancel still get output (and error) files, wait for them
+                batch = client.batches.cancel(batch.id)
+                cancelled = True
+                deadline = time.monotonic() + BATCH_CANCEL_WAIT_SECONDS
+                continue
+            time.sleep(BATCH_POLL_SECONDS)
+            batch = client.batches.retrieve(batch.id)
+        if batch.status != "completed":
+            log(f"Batch {batch.id} ended with status {batch.status}")
+        if batch.output_file_id:
+            output = client.files.content(batch.output_file_id).text
+    except Exception as e:
+        log(f"Error with the Batch API: {e}")
+    finally:
+        if batch is not None:
+            file_ids += [file_id for file_id in (batch.output_file_id, batch.error_file_id) if file_id]
+        for file_id in file_ids:
+            try:
+                client.files.delete(file_id)
+            except Exception as e:
+                log(f"Warning: could not delete Batch API file {file_id}: {e}")
+    if output is None:
+        return answers
+
+    # A cancelled or partly failed job still answers the requests it finished
+    for line in output.splitlines():
+        item = json.loads(line)
+        response = item.get("response")
+        if not response or response.get("status_code") != 200:
+            continue
+        i = int(item["custom_id"])
+        content = response["body"]["choices"][0]["message"]["content"]
+        if content:
+            answers[i] = content
+            cache_store("llm", keys[i], {"model": requests[i][0], "content": content})
+    return answers
+
+def chat_completion(model, messages, temperature, timeout, use_cache=True, on_delta=None, batch_api=False,
+                    batch_deadline=None):
+    """Stream a chat completion and return its text, or None if the model returned no content.
+
+    While streaming, the timeout applies to each read rather than the whole response,
+    so a long answer that keeps producing tokens is not cut off. Answers are cached by
+    request, so re-running on the same transcript does not call the API again.
+    on_delta, if given, is called with each piece of text as it arrives.
+    batch_api: try the Batch API first, waiting until batch_deadline (see batch_chat_completions);
+    on_delta is not called then.
+    """
+    cache_key = request_key(model, messages, temperature)
+    cached = cache_load("llm", cache_key) if use_cache else None
+    if cached is not None:
+        log(f"Using cached {model} response")
+        return cached["content"]
+    if batch_api:
+        content = batch_chat_completions([(model, messages, temperature)], use_cache=False,
+                                         deadline=batch_deadline)[0]
+        if content is not None:
+            return content
+        log(f"No Batch API answer, calling {model} directly")
+
+    stream = openai_client().chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        timeout=timeout,
+        stream=True,
+    )
+    parts = []
+    for part in stream:
+        if part.choices and part.choices[0].delta.content:
+            parts.append(part.choices[0].delta.content)
+            if on_delta:
+                on_delta(part.choices[0].delta.content)
+    if not parts:
+        return None
+    content = "".join(parts)
+    cache_store("llm", cache_key, {"model": model, "content": content})
+    return content
+
+def clean_chunk_request(transcript_chunk, language=None):
+    """(model, messages, temperature) of the request that cleans one transcript chunk.
+    language is the transcription language; it is detected from the text when not given"""
+    if language is None:
+        language = detect_language(transcript_chunk)
+        log(f"Detected language for this chunk: {language}")
     
     if language.startswith('zh'):
-        clean_prompt = f"""請修飾下面的逐字稿：
-- 盡量保留原意
-- 去除贅字
-- 加上正確的標點符號
-- 修正常見錯字（例如：錯別字、同音字、口誤導致的打錯字）
----
-{transcript_chunk}
-"""
+        clean_prompt = CLEAN_PROMPT_ZH.format(transcript=transcript_chunk)
     else:
         # English and other languages
-        clean_prompt = f"""Please clean up the following transcript:
-- Keep the original meaning
-- Remove filler words
-- Add correct punctuation
-- Fix common typos and spelling errors
----
-{transcript_chunk}
-"""
-    
+        clean_prompt = CLEAN_PROMPT_EN.format(transcript=transcript_chunk)
+    return ("gpt-4.1-mini", [
+        {"role": "system", "content": CLEAN_SYSTEM_PROMPT},
+        {"role": "user", "content": clean_prompt},
+    ], 0.2)
+
+def clean_transcript_chunk(transcript_chunk, force=False, language=None):
+    model, messages, temperature = clean_chunk_request(transcript_chunk, language)
+
     # Try gpt-4.1-mini with increasing timeouts and retries
     timeouts_to_try = [120, 180, 240]  # 2min, 3min, 4min
     max_retries = 3
@@ -236,16 +816,13 @@ def clean_transcript_chunk(transcript_chunk):
         
         try:
             log(f"Attempt {attempt + 1}/{max_retries}: Trying gpt-4.1-mini with {timeout_seconds}s timeout...")
-            response_clean = openai.chat.completions.create(
-                model="gpt-4.1-mini",
-                messages=[
-                    {"role": "system", "content": "You are an expert transcript editor, fluent in English, Chinese, and occasionally French. Keep the original wording as much as possible. Improve clarity and flow, and carefully check for mis-transcribed words, especially similar-sounding ones with different meanings, while preserving the speaker’s intent."},
-                    {"role": "user", "content": clean_prompt},
-                ],
-                temperature=0.2,
-                timeout=timeout_seconds
+            good_transcript = chat_completion(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                timeout=timeout_seconds,
+                use_cache=not force,
             )
-            good_transcript = response_clean.choices[0].message.content
             if good_transcript is None:
                 log(f"Warning: gpt-4.1-mini returned None on attempt {attempt + 1}")
                 if attempt < max_retries - 1:
@@ -268,9 +845,63 @@ def clean_transcript_chunk(transcript_chunk):
     log("All attempts with gpt-4.1-mini failed for transcript cleaning, using original")
     return transcript_chunk
 
-def generate_summary(good_transcript, summary_path, long_summary_prompt_file=None):
-    # Detect language and create appropriate prompt
-    language = detect_language(good_transcript)
+# gpt-4o has a 128k-token context: longer transcripts are first condensed into notes part by part
+SUMMARY_TOKEN_BUDGET = 100000
+# Size of each part condensed by one request
+SUMMARY_PART_TOKEN_BUDGET = 20000
+
+def summary_notes_request(part, language):
+    """(model, messages, temperature) of the request that condenses one part of a long transcript"""
+    if language.startswith('zh'):
+        notes_prompt = NOTES_PROMPT_ZH.format(transcript=part)
+    else:
+        notes_prompt = NOTES_PROMPT_EN.format(transcript=part)
+    return ("gpt-4.1-mini", [
+        {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+        {"role": "user", "content": notes_prompt},
+    ], 0.2)
+
+def condense_transcript(good_transcript, language, force=False, batch_api=False, batch_deadline=None):
+    """Map step of the summary for long transcripts: notes for each part, concatenated in order"""
+    parts = split_transcript(good_transcript, SUMMARY_PART_TOKEN_BUDGET)
+    log(f"Transcript is too long for one summary request, condensing {len(parts)} parts first...")
+    requests = [summary_notes_request(part, language) for part in parts]
+    batched = (batch_chat_completions(requests, use_cache=not force, deadline=batch_deadline) if batch_api
+               else [None] * len(parts))
+
+    def notes(request, part, answer):
+        if not answer:
+            model, messages, temperature = request
+            try:
+                answer = chat_completion(model=model, messages=messages, temperature=temperature, timeout=240,
+                                         use_cache=not force)
+            except Exception as e:
+                log(f"Error condensing a transcript part: {e}")
+        # A part that could not be condensed goes into the summary request as is
+        return answer.strip() if answer else part
+
+    # Parts are independent, so they are condensed concurrently (map keeps their order)
+    with ThreadPoolExecutor(max_workers=min(CLEAN_CONCURRENCY, len(parts))) as executor:
+        return "\n\n".join(executor.map(notes, requests, parts, batched))
+
+def generate_summary(good_transcript, summary_path, long_summary_prompt_file=None, force=False, on_delta=None,
+                     batch_api=False, language=None, batch_deadline=None):
+    # The transcription language picks the prompt; detect it from the text when not given
+    if language is None:
+        language = detect_language(good_transcript)
+    encoder = token_encoder()
+    tokens = len(encoder.encode(good_transcript))
+    # Condensed again while the notes are still too long (recordings of many hours)
+    while tokens > SUMMARY_TOKEN_BUDGET:
+        condensed = condense_transcript(good_transcript, language, force=force, batch_api=batch_api,
+                                        batch_deadline=batch_deadline)
+        condensed_tokens = len(encoder.encode(condensed))
+        if condensed_tokens >= tokens:
+            # Parts that could not be condensed came back as is: cut instead of sending an over-budget request
+            log(f"Warning: notes are not getting shorter, keeping their first {SUMMARY_TOKEN_BUDGET} tokens")
+            condensed = encoder.decode(encoder.encode(condensed)[:SUMMARY_TOKEN_BUDGET])
+            condensed_tokens = SUMMARY_TOKEN_BUDGET
+        good_transcript, tokens = condensed, condensed_tokens
     long_summary_prompt = None
     if long_summary_prompt_file:
         with open(long_summary_prompt_file, 'r', encoding='utf-8') as f:
@@ -281,164 +912,163 @@ def generate_summary(good_transcript, summary_path, long_summary_prompt_file=Non
             long_summary_prompt = custom_prompt.rstrip() + f"\n\nTranscript:\n{good_transcript}"
     else:
         if language.startswith('zh'):
-            long_summary_prompt = f"""請根據下面的逐字稿，寫一段1000字以內的摘要，涵蓋所有主要speaker的內容和觀點。請：
-
-1. 識別並總結每個主要speaker的重要觀點和貢獻
-2. 描述他們討論的主題、問題或事件
-3. 記錄任何重要的決定、結論或行動項目
-4. 把人物名稱標注在內
-5. 用字自然，不要有太生硬開會的感覺
-6. 修正常見錯別字、類似音的字（例如：產修、殘修 其實都是禪修）
-7. 繁體中文
-
----
-{good_transcript}
-"""
+            long_summary_prompt = SUMMARY_PROMPT_ZH.format(good_transcript=good_transcript)
         else:
             # English and other languages
-            long_summary_prompt = f"""Based on the following transcript, write a summary of up to 1000 words covering all main speakers' content and perspectives. Please:
-
-1. Identify and summarize each main speaker's key points and contributions
-2. Describe the topics, issues, or events they discussed
-3. Note any important decisions, conclusions, or action items
-4. Include person names mentioned
-5. Use natural language, avoid too formal meeting tone
-6. Fix common typos and similar-sounding words
-
----
-{good_transcript}
-"""
-    response_long_summary = openai.chat.completions.create(
+            long_summary_prompt = SUMMARY_PROMPT_EN.format(good_transcript=good_transcript)
+    long_summary = chat_completion(
         model="gpt-4o",
         messages=[
-            {"role": "system", "content": "You are a meeting transcript summarization assistant."},
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
             {"role": "user", "content": long_summary_prompt},
         ],
         temperature=0.2,
-        timeout=120  # 2 minute timeout
+        timeout=120,  # 2 minute timeout
+        use_cache=not force,
+        on_delta=on_delta,
+        batch_api=batch_api,
+        batch_deadline=batch_deadline,
     )
-    long_summary = response_long_summary.choices[0].message.content
     if long_summary is None:
         log("Warning: API returned None for summary, using fallback")
         long_summary = "無法生成摘要" if language.startswith('zh') else "Unable to generate summary"
     else:
         long_summary = long_summary.strip()
-    with open(summary_path, 'w', encoding='utf-8') as f:
-        f.write(long_summary)
+    write_output(summary_path, long_summary)
     log(f"重點摘要: {summary_path}" if language.startswith('zh') else f"Summary: {summary_path}")
     return long_summary
 
-def generate_filename_summary(long_summary):
-    # Detect language and create appropriate prompt
+# The file name only needs the beginning of the summary
+FILENAME_SUMMARY_CHARS = 2000
+# Characters not allowed (or unwanted) in the generated file name
+FILENAME_STRIP_RE = re.compile(r'[\\/*?:"<>|\n\r,]')
+
+def generate_filename_summary(long_summary, force=False, batch_api=False, batch_deadline=None):
+    # Detect language and create appropriate prompt (a custom summary prompt may ask for another language)
     language = detect_language(long_summary)
     
     if language.startswith('zh'):
-        summary_prompt = f"""根據下面的摘要，請給我一句話摘要，適合作為檔案名稱（盡量包含主題、重要事件或主要speaker的名字），請保持在10個字以內，不要包含任何前綴，只需主題內容：
----
-{long_summary}
-"""
+        summary_prompt = FILENAME_PROMPT_ZH.format(summary=long_summary)
     else:
         # English and other languages
-        summary_prompt = f"""Based on the following summary, give me a one-sentence summary suitable as a filename (include the topic, important events, or names of main speakers). Keep it within 10 words, no prefixes, just the topic content:
----
-{long_summary}
-"""
-    response_summary = openai.chat.completions.create(
-        model="gpt-4o",
+        summary_prompt = FILENAME_PROMPT_EN.format(summary=long_summary)
+    summary = chat_completion(
+        model="gpt-4.1-mini",  # A ten-word title does not need the larger model
         messages=[
-            {"role": "system", "content": "You are an assistant that generates concise file names from transcripts."},
+            {"role": "system", "content": FILENAME_SYSTEM_PROMPT},
             {"role": "user", "content": summary_prompt},
         ],
         temperature=0.2,
-        timeout=60  # 1 minute timeout
+        timeout=60,  # 1 minute timeout
+        use_cache=not force,
+        batch_api=batch_api,
+        batch_deadline=batch_deadline,
     )
-    summary = response_summary.choices[0].message.content
     if summary is None:
         log("Warning: API returned None for filename summary, using fallback")
         return "談話記錄" if language.startswith('zh') else "conversation"
     summary = summary.strip()
-    summary = re.sub(r'[\\/*?:"<>|\n\r,]', '', summary)
+    summary = FILENAME_STRIP_RE.sub('', summary)
     return summary
 
-def write_srt(transcript_lines, srt_path):
-    from datetime import timedelta
-    def format_timestamp(seconds):
-        td = timedelta(seconds=float(seconds))
-        return f"{td.seconds//3600:02}:{(td.seconds//60)%60:02}:{td.seconds%60:02},{int(td.microseconds/1000):03}"
-    entries = []
-    for i, line in enumerate(transcript_lines, 1):
-        match = re.match(r"Speaker (\d+): \[(\d+\.\d+)-(\d+\.\d+)\] (.+)", line)
-        if not match:
-            continue
-        speaker, start, end, text = match.groups()
-        entries.append(f"{i}\n{format_timestamp(start)} --> {format_timestamp(end)}\nSpeaker {speaker}: {text}\n")
-    with open(srt_path, "w", encoding="utf-8") as f:
-        f.write("\n".join(entries))
+TRANSCRIPT_LINE_RE = re.compile(r"Speaker (\d+): \[(\d+\.\d+)-(\d+\.\d+)\] (.+)")
+
+def format_timestamp(seconds):
+    # Integer milliseconds instead of a timedelta per cue
+    ms = round(float(seconds) * 1000)
+    return f"{ms // 3600000:02}:{ms // 60000 % 60:02}:{ms // 1000 % 60:02},{ms % 1000:03}"
+
+def parse_transcript(transcript):
+    """Turn transcript text back into (start, end, speaker, text) tuples, skipping other lines"""
+    segments = []
+    for line in transcript.splitlines():
+        match = TRANSCRIPT_LINE_RE.match(line.strip())
+        if match:
+            speaker, start, end, text = match.groups()
+            segments.append((float(start), float(end), speaker, text))
+    return segments
+
+def write_srt(segments, srt_path):
+    """Write (start, end, speaker, text) tuples as SRT subtitles"""
+    # Cues are formatted as they are written instead of joined into one string first
+    def cues():
+        for i, (start, end, speaker, text) in enumerate(segments, 1):
+            if i > 1:
+                yield "\n"  # Blank line between cues
+            yield f"{i}\n{format_timestamp(start)} --> {format_timestamp(end)}\nSpeaker {speaker}: {text}\n"
+    write_output(srt_path, cues())
     log(f"SRT subtitles saved to: {srt_path}")
 
-def main():
-    valid_options = {
-        '--rename', '--force', '--verbose', '--no-refine', '--summary', '--lang', '--help', '-h', '--long_summary_prompt'
-    }
-    # Check for unknown options
-    unknown_options = [arg for arg in sys.argv[1:] if arg.startswith('--') and not any(arg.startswith(opt) for opt in valid_options)]
-    if unknown_options:
-        print(f"Error: Unknown option(s): {' '.join(unknown_options)}\n")
-        print("Valid options are:")
-        print("  --rename [PREFIX]: Auto-rename files and generate summary for filename")
-        print("  --force: Overwrite existing output files")
-        print("  --verbose: Show detailed progress and real-time output")
-        print("  --no-refine: Skip transcript refinement (much faster, avoids timeout issues)")
-        print("  --summary: Generate conversation summary (slower but more complete)")
-        print("  --lang LANGUAGE: Specify language (default: en, options: zh, ja, ko, fr, de, es, it, pt, ru)")
-        print("  --long_summary_prompt FILE: Use a custom prompt file for long summary generation (transcript will be included automatically)")
-        print("  --help, -h: Show this help message")
-        sys.exit(1)
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
 
-    if len(sys.argv) < 2 or '--help' in sys.argv or '-h' in sys.argv:
-        print("Usage: python this_script.py input_file.mov|mp4|mp3|wav [--rename [PREFIX] --force --verbose --no-refine --summary --lang LANGUAGE --long_summary_prompt FILE]")
-        print("  --no-refine: Skip transcript refinement (much faster, avoids timeout issues)")
-        print("  --summary: Generate conversation summary (slower but more complete)")
-        print("  --rename [PREFIX]: Auto-rename files and generate summary for filename")
-        print("                    PREFIX is optional (e.g., --rename AI_Panel_Discussion)")
-        print("  --lang LANGUAGE: Specify language (default: en, options: zh, ja, ko, fr, de, es, it, pt, ru)")
-        print("  --long_summary_prompt FILE: Use a custom prompt file for long summary generation (transcript will be included automatically)")
-        print("  Note: English is used by default. Use --lang to specify other languages.")
-        print("  Examples:")
-        print("    python script.py video.mp4  # Uses English (default)")
-        print("    python script.py video.mp4 --lang zh")
-        print("    python script.py video.mp4 --lang ja --summary")
-        print("    python script.py video.mp4 --lang en --summary --verbose")
-        print("    python script.py video.mp4 --rename  # Auto-rename with summary")
-        print("    python script.py video.mp4 --rename Interview_Vertex  # With custom prefix")
-        print("    python script.py video.mp4 --long_summary_prompt custom_prompt.txt")
-        sys.exit(0)
-
-    input_file = sys.argv[1]
-    rename_file = '--rename' in sys.argv
-    rename_prefix = None
-    
-    # Parse rename prefix if provided
-    if '--rename' in sys.argv:
-        rename_index = sys.argv.index('--rename')
-        if rename_index + 1 < len(sys.argv) and not sys.argv[rename_index + 1].startswith('--'):
-            rename_prefix = sys.argv[rename_index + 1]
-            log(f"Using rename prefix: {rename_prefix}")
-    
-    verbose = '--verbose' in sys.argv
-    force = '--force' in sys.argv
-    skip_refinement = '--no-refine' in sys.argv
-    should_generate_summary = '--summary' in sys.argv or rename_file  # Generate summary if --summary or --rename is used
-    
-    # Parse language argument
-    language = 'en'  # Default to English
-    if '--lang' in sys.argv:
-        lang_index = sys.argv.index('--lang')
-        if lang_index + 1 < len(sys.argv):
-            language = sys.argv[lang_index + 1]
-            log(f"Using specified language: {language}")
-        else:
-            log("Warning: --lang specified but no language given, using English (default)")
+def parse_options(argv):
+    """Parse command line arguments into (input_files, keyword arguments for transcribe_file())"""
+    parser = argparse.ArgumentParser(
+        prog=os.path.basename(argv[0]) if argv else "conversation_transcriber.py",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""Note: English is used by default. Use --lang to specify other languages.
+
+EXAMPLES:
+  python script.py video.mp4  # Uses English (default)
+  python script.py video.mp4 --lang zh
+  python script.py video.mp4 --lang ja --summary
+  python script.py video.mp4 --lang en --summary --verbose
+  python script.py video.mp4 --rename  # Auto-rename with summary
+  python script.py video.mp4 --rename Interview_Vertex  # With custom prefix
+  python script.py video.mp4 --long_summary_prompt custom_prompt.txt
+  python script.py part1.mp4 part2.mp4 --lang zh  # Several files, models loaded once""",
+    )
+    parser.add_argument("input_files", nargs="+", metavar="INPUT_FILE",
+                        help="Recording(s) to transcribe (.mov, .mp4, .mp3, .wav, ...)")
+    parser.add_argument("--rename", nargs="?", const="", default=None, metavar="PREFIX",
+                        help="Auto-rename files and generate summary for filename "
+                             "(PREFIX is optional, e.g. --rename AI_Panel_Discussion)")
+    parser.add_argument("--force", action="store_true", help="Overwrite existing output files")
+    parser.add_argument("--verbose", action="store_true", help="Show detailed progress and real-time output")
+    parser.add_argument("--no-refine", action="store_true",
+                        help="Skip transcript refinement (much faster, avoids timeout issues)")
+    parser.add_argument("--summary", action="store_true",
+                        help="Generate conversation summary (slower but more complete)")
+    parser.add_argument("--lang", metavar="LANGUAGE",
+                        help="Specify language (default: en, options: zh, ja, ko, fr, de, es, it, pt, ru)")
+    parser.add_argument("--long_summary_prompt", metavar="FILE",
+                        help="Use a custom prompt file for long summary generation (transcript will be included automatically)")
+    parser.add_argument("--whisper-backend", choices=WHISPER_BACKENDS, default="auto", metavar="NAME",
+                        help=f"Whisper engine (default: auto, options: {', '.join(WHISPER_BACKENDS[1:])}); auto uses "
+                             "faster-whisper on an NVIDIA GPU or mlx on Apple Silicon when installed, whisper.cpp otherwise")
+    parser.add_argument("--whisper-model", metavar="NAME",
+                        help="Whisper model name, or a ggml model file for whisper.cpp (default: large-v3; "
+                             "whisper.cpp uses the quantized large-v3-q5_0 unless HIGH_ACCURACY=1 is set)")
+    parser.add_argument("--whisper-workers", type=positive_int, default=1, metavar="N",
+                        help="Transcribe N windows in parallel (default: 1). With whisper.cpp each worker "
+                             "loads its own model and gets an equal share of the CPU cores")
+    parser.add_argument("--vad-only", action="store_true",
+                        help="Only detect speech instead of full speaker diarization (faster, every line is Speaker 00)")
+    parser.add_argument("--diarize-chunk-minutes", type=positive_int, metavar="N",
+                        help="Diarize recordings longer than N minutes in N-minute chunks, "
+                             "matching speakers between chunks by voice (faster on very long recordings)")
+    parser.add_argument("--batch-api", action="store_true",
+                        help="Send refinement and summary requests through the OpenAI Batch API (half price; "
+                             "may wait up to 30 minutes per request before falling back to a direct call)")
+    args = parser.parse_args(argv[1:])
+    input_files = args.input_files
+    # "--rename a.mp4 b.mp4" would take a.mp4 as the prefix
+    if args.rename and os.path.exists(args.rename):
+        parser.error(f"--rename prefix '{args.rename}' is an existing file; put the input files before --rename")
+
+    rename_prefix = args.rename or None
+    if rename_prefix:
+        log(f"Using rename prefix: {rename_prefix}")
+
+    # Language - English is default
+    language = 'en'
+    if args.lang:
+        language = args.lang
+        log(f"Using specified language: {language}")
     else:
         print("\n" + "="*60)
         print("LANGUAGE SETTING")
@@ -451,163 +1081,262 @@ def main():
         print("="*60)
         log("Using English as default language. Use --lang to specify other languages (zh, ja, ko, fr, de, es, it, pt, ru)")
 
-    # Parse long_summary_prompt file if provided
-    long_summary_prompt_file = None
-    custom_prompt_preview = None
-    if '--long_summary_prompt' in sys.argv:
-        lsp_index = sys.argv.index('--long_summary_prompt')
-        if lsp_index + 1 < len(sys.argv) and not sys.argv[lsp_index + 1].startswith('--'):
-            long_summary_prompt_file = sys.argv[lsp_index + 1]
-            if not os.path.exists(long_summary_prompt_file):
-                print(f"Error: Custom long summary prompt file '{long_summary_prompt_file}' not found.")
-                sys.exit(1)
-            # Print the file name and prompt preview at the beginning
-            with open(long_summary_prompt_file, 'r', encoding='utf-8') as f:
-                custom_prompt = f.read()
-            print("\n==============================")
-            print(f"Using custom long summary prompt file: {long_summary_prompt_file}")
-            print("------------------------------")
-            if '{good_transcript}' in custom_prompt:
-                preview = custom_prompt.replace('{good_transcript}', '[TRANSCRIPT HERE]')
-            else:
-                preview = custom_prompt.rstrip() + '\n\nTranscript:\n[TRANSCRIPT HERE]'
-            print(preview)
-            print("==============================\n")
+    long_summary_prompt_file = args.long_summary_prompt
+    if long_summary_prompt_file is not None:
+        if not os.path.exists(long_summary_prompt_file):
+            print(f"Error: Custom long summary prompt file '{long_summary_prompt_file}' not found.")
+            sys.exit(1)
+        # Print the file name and prompt preview at the beginning
+        with open(long_summary_prompt_file, 'r', encoding='utf-8') as f:
+            custom_prompt = f.read()
+        print("\n==============================")
+        print(f"Using custom long summary prompt file: {long_summary_prompt_file}")
+        print("------------------------------")
+        if '{good_transcript}' in custom_prompt:
+            preview = custom_prompt.replace('{good_transcript}', '[TRANSCRIPT HERE]')
         else:
-            print("Error: --long_summary_prompt specified but no file given.")
+            preview = custom_prompt.rstrip() + '\n\nTranscript:\n[TRANSCRIPT HERE]'
+        print(preview)
+        print("==============================\n")
+
+    for input_file in input_files:
+        if not os.path.exists(input_file):
+            print(f"File not found: {input_file}")
             sys.exit(1)
 
-    if not os.path.exists(input_file):
-        print(f"File not found: {input_file}")
-        sys.exit(1)
+    return input_files, dict(
+        language=language,
+        rename=args.rename is not None,
+        rename_prefix=rename_prefix,
+        verbose=args.verbose,
+        force=args.force,
+        skip_refinement=args.no_refine,
+        summary=args.summary,
+        long_summary_prompt_file=long_summary_prompt_file,
+        whisper_backend=args.whisper_backend,
+        whisper_workers=args.whisper_workers,
+        whisper_model=args.whisper_model,
+        vad_only=args.vad_only,
+        diarize_chunk_minutes=args.diarize_chunk_minutes,
+        batch_api=args.batch_api,
+    )
 
-    base = os.path.splitext(os.path.basename(input_file))[0]
-    if base.endswith('_480p'):
-        base = base[:-6]
-    basepath = os.path.dirname(input_file)
-    output_prefix = base
-
-    # Add language code to output file names, but avoid duplicate lang codes
-    # Use 'language' directly for file naming
-    def add_land_index(base, language, ext):
-        if base.endswith(f"_{language}"):
-            return f"{base}{ext}"
-        else:
-            return f"{base}_{language}{ext}"
+# Recording date in the input file name: 2024-05-31 or 20240531
+DATE_RE = re.compile(r'(\d{4}-\d{2}-\d{2})')
+COMPACT_DATE_RE = re.compile(r'(\d{8})')
 
-    raw_transcript_path = os.path.join(basepath, add_land_index(output_prefix + ".raw_transcript", language, ".txt"))
-    good_transcript_path = os.path.join(basepath, add_land_index(output_prefix + ".refined_transcript", language, ".txt"))
-    summary_path = os.path.join(basepath, add_land_index(output_prefix + ".summary", language, ".txt"))
-    srt_path = os.path.join(basepath, add_land_index(output_prefix, language, ".srt"))
+def transcribe_file(input_file, language='en', rename=False, rename_prefix=None, verbose=False, force=False,
+                    skip_refinement=False, summary=False, long_summary_prompt_file=None, whisper_backend='auto',
+                    whisper_workers=1, whisper_model=None, vad_only=False, diarize_chunk_minutes=None, batch_api=False,
+                    transcript=None, free_models=False):
+    """Transcribe one recording and write its transcript, summary and subtitle files
+
+    transcript: (text, segments) of the raw transcript already generated for this file (see transcribe_files)
+    free_models: release the models (see release_models) before the refinement and summary stage
+    """
+    if not os.path.exists(input_file):
+        raise FileNotFoundError(input_file)
+    should_generate_summary = summary or rename  # Generate summary if --summary or --rename is used
+
+    basepath, base = output_base(input_file)
+    raw_transcript_path, good_transcript_path, summary_path, srt_path = output_paths(basepath, base, language)
 
     # Only exit early if we're not doing rename and files exist
-    if os.path.exists(good_transcript_path) and not force and not rename_file:
+    if os.path.exists(good_transcript_path) and not force and not rename:
         if should_generate_summary and os.path.exists(summary_path):
             log("Both refined transcript and summary already exist. Use --force to overwrite or --rename to rename existing files.")
-            sys.exit(0)
+            return
         elif not should_generate_summary:
             log("Refined transcript already exists. Use --force to overwrite or --rename to rename existing files.")
-            sys.exit(0)
+            return
 
     # ---- STEP 1: get or generate good_transcript ----
+    segments = None
+    batch_deadline = None  # Shared by all Batch API jobs of this file, from the first request on
     if os.path.exists(good_transcript_path) and not force:
         with open(good_transcript_path, "r", encoding="utf-8") as f:
             good_transcript = f.read()
         log(f"Found existing refined transcript at {good_transcript_path}")
     else:
-        pipeline = load_diarization_pipeline(HF_TOKEN)
-        transcript = load_or_generate_transcript(input_file, raw_transcript_path, pipeline, verbose, language, force=force)
+        if transcript is None:
+            transcript = load_or_generate_transcript(input_file, raw_transcript_path, verbose=verbose, language=language,
+                                                     force=force, whisper_backend=whisper_backend,
+                                                     whisper_workers=whisper_workers, vad_only=vad_only,
+                                                     whisper_model=whisper_model, diarize_chunk_minutes=diarize_chunk_minutes)
+            if free_models:
+                release_models()
+        transcript, segments = transcript
         
         if skip_refinement:
             log("Skipping transcript refinement (--no-refine flag used)")
             good_transcript = transcript
-            with open(good_transcript_path, 'w', encoding='utf-8') as f:
-                f.write(good_transcript)
+            write_output(good_transcript_path, good_transcript)
         else:
-            good_transcript = clean_transcript(transcript, good_transcript_path)
+            if batch_api:
+                batch_deadline = time.monotonic() + BATCH_MAX_WAIT_SECONDS
+            good_transcript = clean_transcript(transcript, good_transcript_path, force=force, batch_api=batch_api,
+                                               language=language, batch_deadline=batch_deadline)
 
     # ---- STEP 2: get or generate summary ----
-    if should_generate_summary:
-        if os.path.exists(summary_path) and not force:
-            log(f"Found existing summary at {summary_path}")
-            with open(summary_path, "r", encoding="utf-8") as f:
-                long_summary = f.read()
+    if batch_api and batch_deadline is None:
+        batch_deadline = time.monotonic() + BATCH_MAX_WAIT_SECONDS
+    # For --rename, the file name is generated from the start of the summary, in the background
+    # as soon as that much of the summary has streamed in
+    filename_executor = ThreadPoolExecutor(max_workers=1) if rename and should_generate_summary else None
+    try:
+        filename_future = None
+        if should_generate_summary:
+            if os.path.exists(summary_path) and not force:
+                log(f"Found existing summary at {summary_path}")
+                with open(summary_path, "r", encoding="utf-8") as f:
+                    long_summary = f.read()
+            else:
+                summary_start = []
+                summary_start_chars = 0
+                def on_summary_delta(delta):
+                    nonlocal filename_future, summary_start_chars
+                    if filename_executor is None or filename_future is not None:
+                        return
+                    summary_start.append(delta)
+                    summary_start_chars += len(delta)
+                    if summary_start_chars >= FILENAME_SUMMARY_CHARS:
+                        log("Generating file name from the beginning of the summary...")
+                        filename_future = filename_executor.submit(
+                            generate_filename_summary, "".join(summary_start).lstrip()[:FILENAME_SUMMARY_CHARS], force=force)
+                long_summary = generate_summary(good_transcript, summary_path, long_summary_prompt_file, force=force,
+                                                on_delta=on_summary_delta, batch_api=batch_api, language=language,
+                                                batch_deadline=batch_deadline)
         else:
-            long_summary = generate_summary(good_transcript, summary_path, long_summary_prompt_file)
-    else:
-        log("Skipping summary generation (use --summary or --rename flag to enable)")
-        long_summary = "No summary generated. Use --summary or --rename flag to generate conversation summary."
-
-    # Save .srt subtitles
-    if skip_refinement:
-        if os.path.exists(raw_transcript_path):
-            with open(raw_transcript_path, "r", encoding="utf-8") as f:
-                transcript_lines = f.read().strip().splitlines()
-            write_srt(transcript_lines, srt_path)
-    else:
-        if os.path.exists(good_transcript_path):
-            with open(good_transcript_path, "r", encoding="utf-8") as f:
-                transcript_lines = f.read().strip().splitlines()
-            write_srt(transcript_lines, srt_path)
-
-    # --- Summary-based renaming ---
-    if rename_file:
-        date_match = re.search(r'(\d{4}-\d{2}-\d{2})', base)
-        if date_match:
-            date_str = date_match.group(1)
+            log("Skipping summary generation (use --summary or --rename flag to enable)")
+            long_summary = "No summary generated. Use --summary or --rename flag to generate conversation summary."
+
+        # Save .srt subtitles
+        if skip_refinement:
+            # Straight from the transcription when it ran in this call, no text round-trip
+            if segments is not None:
+                write_srt(segments, srt_path)
+            elif os.path.exists(raw_transcript_path):
+                with open(raw_transcript_path, "r", encoding="utf-8") as f:
+                    write_srt(parse_transcript(f.read()), srt_path)
         else:
-            date_match = re.search(r'(\d{8})', base)
+            write_srt(parse_transcript(good_transcript), srt_path)
+
+        # --- Summary-based renaming ---
+        if rename:
+            date_match = DATE_RE.search(base)
             if date_match:
-                d = date_match.group(1)
-                date_str = f"{d[:4]}-{d[4:6]}-{d[6:]}"
+                date_str = date_match.group(1)
             else:
-                date_str = datetime.now().strftime('%Y-%m-%d')
-        if should_generate_summary:
-            summary_for_name = generate_filename_summary(long_summary)
-        else:
-            summary_for_name = "conversation"
-        ext = os.path.splitext(input_file)[1]
+                date_match = COMPACT_DATE_RE.search(base)
+                if date_match:
+                    d = date_match.group(1)
+                    date_str = f"{d[:4]}-{d[4:6]}-{d[6:]}"
+                else:
+                    date_str = datetime.now().strftime('%Y-%m-%d')
+            if filename_future is not None:
+                summary_for_name = filename_future.result()
+            elif should_generate_summary:
+                summary_for_name = generate_filename_summary(long_summary[:FILENAME_SUMMARY_CHARS], force=force,
+                                                             batch_api=batch_api, batch_deadline=batch_deadline)
+            else:
+                summary_for_name = "conversation"
+            ext = os.path.splitext(input_file)[1]
         
-        # Build the new filename with optional prefix
-        if rename_prefix:
-            new_base = f"{date_str}_{rename_prefix}_{summary_for_name}"
-        else:
-            new_base = f"{date_str}_{summary_for_name}"
+            # Build the new filename with optional prefix
+            if rename_prefix:
+                new_base = f"{date_str}_{rename_prefix}_{summary_for_name}"
+            else:
+                new_base = f"{date_str}_{summary_for_name}"
 
-        # Replace spaces with underscores in the new base name
-        new_base = new_base.replace(' ', '_')
+            # Replace spaces with underscores in the new base name
+            new_base = new_base.replace(' ', '_')
 
-        # --- Rename main media file ---
-        # Insert lang_code before the extension
-        new_file_path = os.path.join(basepath, f"{new_base}_{language}{ext}")
-        if os.path.abspath(new_file_path) != os.path.abspath(input_file):
-            if os.path.exists(new_file_path):
-                log(f"Target file {new_file_path} already exists. Skipping rename.")
-            else:
-                os.rename(input_file, new_file_path)
-                log(f"Original file: {input_file}")
-                log(f"Renamed original file to: {new_file_path}")
-
-        # --- Rename transcript and summary files ---
-        new_raw_transcript_path = os.path.join(basepath, add_land_index(new_base + ".raw_transcript", language, ".txt"))
-        new_good_transcript_path = os.path.join(basepath, add_land_index(new_base + ".refined_transcript", language, ".txt"))
-        new_summary_path = os.path.join(basepath, add_land_index(new_base + ".summary", language, ".txt"))
-        new_srt_path = os.path.join(basepath, add_land_index(new_base, language, ".srt"))
-        def safe_rename(src, dst):
-            if os.path.exists(src):
-                if os.path.exists(dst):
-                    log(f"Target file {dst} already exists. Skipping rename for transcript/summary.")
+            # --- Rename main media file ---
+            # Insert lang_code before the extension
+            new_file_path = os.path.join(basepath, f"{new_base}_{language}{ext}")
+            if os.path.abspath(new_file_path) != os.path.abspath(input_file):
+                if os.path.exists(new_file_path):
+                    log(f"Target file {new_file_path} already exists. Skipping rename.")
                 else:
-                    os.rename(src, dst)
-                    log(f"Renamed: {src} -> {dst}")
-            else:
-                log(f"File {src} not found, cannot rename.")
+                    os.rename(input_file, new_file_path)
+                    log(f"Original file: {input_file}")
+                    log(f"Renamed original file to: {new_file_path}")
 
-        safe_rename(raw_transcript_path, new_raw_transcript_path)
-        safe_rename(good_transcript_path, new_good_transcript_path)
-        if should_generate_summary:
-            safe_rename(summary_path, new_summary_path)
-        safe_rename(srt_path, new_srt_path)
+            # --- Rename transcript and summary files ---
+            new_raw_transcript_path, new_good_transcript_path, new_summary_path, new_srt_path = output_paths(basepath, new_base, language)
+            def safe_rename(src, dst):
+                if os.path.exists(src):
+                    if os.path.exists(dst):
+                        log(f"Target file {dst} already exists. Skipping rename for transcript/summary.")
+                    else:
+                        os.rename(src, dst)
+                        log(f"Renamed: {src} -> {dst}")
+                else:
+                    log(f"File {src} not found, cannot rename.")
+
+            safe_rename(raw_transcript_path, new_raw_transcript_path)
+            safe_rename(good_transcript_path, new_good_transcript_path)
+            if should_generate_summary:
+                safe_rename(summary_path, new_summary_path)
+            safe_rename(srt_path, new_srt_path)
+    finally:
+        # Also on errors: don't wait for a file name request nobody will use
+        if filename_executor is not None:
+            filename_executor.shutdown(wait=False)
+
+def transcribe_files(input_files, free_models=False, **options):
+    """Transcribe several recordings, overlapping the GPU and API stages of different files.
+
+    Diarization and Whisper run for one file at a time in this thread (the models stay loaded);
+    refinement, summaries, subtitles and renaming run in background threads meanwhile.
+    With free_models the models are released after the last file has been transcribed.
+    Returns the list of files that failed.
+    """
+    language = options.get('language', 'en')
+    force = options.get('force', False)
+    failed = []
+    with ThreadPoolExecutor(max_workers=POSTPROCESS_WORKERS) as executor:
+        futures = {}
+        for i, input_file in enumerate(input_files, 1):
+            log(f"({i}/{len(input_files)}) Processing {input_file}")
+            transcript = None
+            try:
+                raw_transcript_path, good_transcript_path, _, _ = output_paths(*output_base(input_file), language)
+                if force or not os.path.exists(good_transcript_path):
+                    transcript = load_or_generate_transcript(input_file, raw_transcript_path, verbose=options.get('verbose', False),
+                                                             language=language, force=force,
+                                                             whisper_backend=options.get('whisper_backend', 'auto'),
+                                                             whisper_workers=options.get('whisper_workers', 1),
+                                                             vad_only=options.get('vad_only', False),
+                                                             whisper_model=options.get('whisper_model'),
+                                                             diarize_chunk_minutes=options.get('diarize_chunk_minutes'))
+            except Exception as e:
+                log(f"Error transcribing {input_file}: {e}")
+                failed.append(input_file)
+                continue
+            futures[executor.submit(transcribe_file, input_file, transcript=transcript, **options)] = input_file
+        if free_models:
+            release_models()
+        for future, input_file in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                log(f"Error processing {input_file}: {e}")
+                failed.append(input_file)
+    return failed
+
+def main():
+    input_files, options = parse_options(sys.argv)
+    if HF_TOKEN is None:
+        print("Error: HF_TOKEN is not set. Please check your .env file.")
+        sys.exit(1)
+    if len(input_files) == 1:
+        transcribe_file(input_files[0], free_models=True, **options)
+        return
+    failed = transcribe_files(input_files, free_models=True, **options)
+    if failed:
+        log(f"{len(failed)} of {len(input_files)} files failed: {', '.join(failed)}")
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
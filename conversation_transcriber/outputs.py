@@ -0,0 +1,46 @@
+import os
+import threading
+
+# Output file naming shared by conversation_transcriber and batch_transcribe
+
+def output_base(input_file):
+    base = os.path.splitext(os.path.basename(input_file))[0]
+    if base.endswith('_480p'):
+        base = base[:-6]
+    basepath = os.path.dirname(input_file)
+    return basepath, base
+
+def add_land_index(base, language, ext):
+    # Add language code to output file names, but avoid duplicate lang codes
+    if base.endswith(f"_{language}"):
+        return f"{base}{ext}"
+    else:
+        return f"{base}_{language}{ext}"
+
+def output_paths(basepath, base, language):
+    """Return (raw_transcript, refined_transcript, summary, srt) paths for an output base name"""
+    raw_transcript_path = os.path.join(basepath, add_land_index(base + ".raw_transcript", language, ".txt"))
+    good_transcript_path = os.path.join(basepath, add_land_index(base + ".refined_transcript", language, ".txt"))
+    summary_path = os.path.join(basepath, add_land_index(base + ".summary", language, ".txt"))
+    srt_path = os.path.join(basepath, add_land_index(base, language, ".srt"))
+    return raw_transcript_path, good_transcript_path, summary_path, srt_path
+
+def write_output(path, text):
+    """Write an output file through a temporary file, so an interrupted run never leaves half a file
+    that the next run would take as finished. text is a string or an iterable of strings"""
+    # Unique per writing thread, since post-processing threads write while the main loop does
+    # (not mkstemp: its files are private to the user, outputs get the usual umask permissions)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            if isinstance(text, str):
+                f.write(text)
+            else:
+                f.writelines(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
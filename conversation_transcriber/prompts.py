@@ -0,0 +1,77 @@
+# Prompts of the OpenAI requests, formatted with str.format right before each request.
+# Changing a prompt changes the request, so cached answers of the old prompt are not reused.
+
+# Transcript cleaning, one chunk at a time
+CLEAN_SYSTEM_PROMPT = "You are an expert transcript editor, fluent in English, Chinese, and occasionally French. Keep the original wording as much as possible. Improve clarity and flow, and carefully check for mis-transcribed words, especially similar-sounding ones with different meanings, while preserving the speaker’s intent."
+
+CLEAN_PROMPT_ZH = """請修飾下面的逐字稿：
+- 盡量保留原意
+- 去除贅字
+- 加上正確的標點符號
+- 修正常見錯字（例如：錯別字、同音字、口誤導致的打錯字）
+---
+{transcript}
+"""
+
+CLEAN_PROMPT_EN = """Please clean up the following transcript:
+- Keep the original meaning
+- Remove filler words
+- Add correct punctuation
+- Fix common typos and spelling errors
+---
+{transcript}
+"""
+
+# Summary; custom prompt files use the same {good_transcript} placeholder
+SUMMARY_SYSTEM_PROMPT = "You are a meeting transcript summarization assistant."
+
+SUMMARY_PROMPT_ZH = """請根據下面的逐字稿，寫一段1000字以內的摘要，涵蓋所有主要speaker的內容和觀點。請：
+
+1. 識別並總結每個主要speaker的重要觀點和貢獻
+2. 描述他們討論的主題、問題或事件
+3. 記錄任何重要的決定、結論或行動項目
+4. 把人物名稱標注在內
+5. 用字自然，不要有太生硬開會的感覺
+6. 修正常見錯別字、類似音的字（例如：產修、殘修 其實都是禪修）
+7. 繁體中文
+
+---
+{good_transcript}
+"""
+
+SUMMARY_PROMPT_EN = """Based on the following transcript, write a summary of up to 1000 words covering all main speakers' content and perspectives. Please:
+
+1. Identify and summarize each main speaker's key points and contributions
+2. Describe the topics, issues, or events they discussed
+3. Note any important decisions, conclusions, or action items
+4. Include person names mentioned
+5. Use natural language, avoid too formal meeting tone
+6. Fix common typos and similar-sounding words
+
+---
+{good_transcript}
+"""
+
+# Notes on each part of a transcript too long for one summary request
+NOTES_PROMPT_ZH = """請把下面這段逐字稿整理成重點筆記：條列每個主要speaker的觀點、討論的主題或事件、重要的決定和行動項目，保留人物名稱。請用繁體中文：
+---
+{transcript}
+"""
+
+NOTES_PROMPT_EN = """Condense the following part of a transcript into notes: list each main speaker's key points, the topics or events discussed, and any decisions or action items. Keep person names:
+---
+{transcript}
+"""
+
+# File name from the summary
+FILENAME_SYSTEM_PROMPT = "You are an assistant that generates concise file names from transcripts."
+
+FILENAME_PROMPT_ZH = """根據下面的摘要，請給我一句話摘要，適合作為檔案名稱（盡量包含主題、重要事件或主要speaker的名字），請保持在10個字以內，不要包含任何前綴，只需主題內容：
+---
+{summary}
+"""
+
+FILENAME_PROMPT_EN = """Based on the following summary, give me a one-sentence summary suitable as a filename (include the topic, important events, or names of main speakers). Keep it within 10 words, no prefixes, just the topic content:
+---
+{summary}
+"""
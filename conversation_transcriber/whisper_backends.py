@@ -0,0 +1,141 @@
+import os
+import sys
+import bisect
+import functools
+import threading
+import importlib.util
+from collections import namedtuple
+
+import numpy as np
+import torch
+from pywhispercpp.model import Model
+
+# Whisper engines that run_diarization_and_transcription can use, all behind the same interface:
+# backend.transcribe(samples, language) -> [WhisperSegment] with times in seconds from the clip start
+# Backends that batch on their own also have transcribe_clips(clips, language) -> [[WhisperSegment]]
+
+WHISPER_BACKENDS = ('auto', 'whispercpp', 'faster-whisper', 'mlx')
+
+# MLX ports of the whisper.cpp model names
+MLX_MODELS = {
+    "large-v3": "mlx-community/whisper-large-v3-mlx-4bit",
+}
+
+SAMPLE_RATE = 16000
+# Whisper's context: faster-whisper's batched pipeline pads or cuts every clip to this length
+MAX_CLIP_SECONDS = 30
+# Windows decoded together per forward pass by faster-whisper
+FASTER_WHISPER_BATCH_SIZE = 16
+
+WhisperSegment = namedtuple("WhisperSegment", ["start", "end", "text"])
+
+class WhisperCppBackend:
+    """whisper.cpp through pywhispercpp (CPU, default)"""
+
+    def __init__(self, model_name, n_threads=None):
+        # One whisper.cpp context runs one transcription at a time, so each worker gets its own model
+        self.model = Model(model_name, n_threads=n_threads) if n_threads else Model(model_name)
+
+    def transcribe(self, samples, language=None):
+        # whisper.cpp reports segment times in 10 ms units
+        return [WhisperSegment(seg.t0 / 100, seg.t1 / 100, seg.text)
+                for seg in self.model.transcribe(samples, language=language)]
+
+class FasterWhisperBackend:
+    """CTranslate2 through faster-whisper: int8 weights with float16 compute on an NVIDIA GPU, int8 on older GPUs and the CPU"""
+
+    def __init__(self, model_name, workers=1):
+        # Optional dependency: pip install conversation-transcriber[gpu]
+        from faster_whisper import WhisperModel, BatchedInferencePipeline
+        # num_workers lets one model serve that many transcribe() calls from different threads;
+        # with several GPUs the model is loaded on each of them and the calls are spread across the GPUs
+        if torch.cuda.is_available():
+            devices = list(range(torch.cuda.device_count()))
+            # float16 compute needs Tensor Cores (compute capability 7.0+); older GPUs run plain int8
+            tensor_cores = min(torch.cuda.get_device_capability(i)[0] for i in devices) >= 7
+            self.model = WhisperModel(model_name, device="cuda", device_index=devices,
+                                      compute_type="int8_float16" if tensor_cores else "int8", num_workers=workers)
+        else:
+            self.model = WhisperModel(model_name, device="cpu", compute_type="int8", num_workers=workers)
+        self.batched = BatchedInferencePipeline(model=self.model)
+
+    def transcribe(self, samples, language=None):
+        segments, _ = self.model.transcribe(samples, language=language, beam_size=1, vad_filter=False)
+        return [WhisperSegment(seg.start, seg.end, seg.text) for seg in segments]
+
+    def transcribe_clips(self, clips, language=None):
+        """Transcribe many clips of at most 30 s, FASTER_WHISPER_BATCH_SIZE per forward pass"""
+        if not clips:
+            return []
+        # Anything past 30 s would be dropped without a trace; callers fall back to transcribe() on errors
+        longest = max(len(clip) for clip in clips) / SAMPLE_RATE
+        if longest > MAX_CLIP_SECONDS:
+            raise ValueError(f"Clip of {longest:.1f} s is longer than {MAX_CLIP_SECONDS} s")
+        # The clips are laid end to end and passed as clip_timestamps, one batch element each.
+        # The pipeline slices the audio with them, so they are sample offsets; segments come back in seconds
+        offsets = [0]
+        for clip in clips[:-1]:
+            offsets.append(offsets[-1] + len(clip))
+        clip_timestamps = [{"start": offset, "end": offset + len(clip)} for offset, clip in zip(offsets, clips)]
+        starts = [offset / SAMPLE_RATE for offset in offsets]
+        segments, _ = self.batched.transcribe(np.concatenate(clips), language=language, clip_timestamps=clip_timestamps,
+                                              vad_filter=False, without_timestamps=False,
+                                              batch_size=FASTER_WHISPER_BATCH_SIZE)
+        results = [[] for _ in clips]
+        for seg in segments:
+            k = max(0, bisect.bisect_right(starts, (seg.start + seg.end) / 2) - 1)
+            results[k].append(WhisperSegment(seg.start - starts[k], seg.end - starts[k], seg.text))
+        return results
+
+class MlxWhisperBackend:
+    """mlx-whisper on the Apple Silicon GPU, 4-bit weights in unified memory"""
+
+    def __init__(self, model_name):
+        import mlx_whisper  # Optional dependency: pip install conversation-transcriber[mlx]
+        self.mlx_whisper = mlx_whisper
+        self.model_repo = MLX_MODELS.get(model_name, model_name)
+
+    def transcribe(self, samples, language=None):
+        # mlx-whisper keeps the loaded model between calls
+        result = self.mlx_whisper.transcribe(samples, path_or_hf_repo=self.model_repo, language=language)
+        return [WhisperSegment(seg["start"], seg["end"], seg["text"]) for seg in result["segments"]]
+
+def resolve_whisper_backend(name='auto'):
+    """Pick a concrete backend for 'auto': faster-whisper on CUDA, mlx on Apple Silicon (when installed), else whisper.cpp"""
+    if name != 'auto':
+        return name
+    if torch.cuda.is_available() and importlib.util.find_spec("faster_whisper") is not None:
+        return 'faster-whisper'
+    if (sys.platform == 'darwin' and torch.backends.mps.is_available()
+            and importlib.util.find_spec("mlx_whisper") is not None):
+        return 'mlx'
+    return 'whispercpp'
+
+def load_whisper_backends(name, model_name, workers=1):
+    """One backend per worker thread; backends that are safe to share appear several times"""
+    with _load_lock:
+        return _load_backends(resolve_whisper_backend(name), model_name, max(1, workers))
+
+# lru_cache alone would let two threads that miss at the same time both load the model
+_load_lock = threading.Lock()
+
+def release_whisper_backends():
+    """Drop the cached models; the next load_whisper_backends() loads them again"""
+    with _load_lock:
+        _load_backends.cache_clear()
+
+@functools.lru_cache(maxsize=2)
+def _load_backends(name, model_name, workers):
+    # Cached: loading large-v3 takes seconds, so every file transcribed in this process shares the models
+    if name == 'faster-whisper':
+        return (FasterWhisperBackend(model_name, workers),) * workers
+    if name == 'whispercpp':
+        if workers == 1:
+            return (WhisperCppBackend(model_name),)
+        # Split the cores between the workers instead of every model starting a thread per core
+        n_threads = max(1, (os.cpu_count() or 1) // workers)
+        return tuple(WhisperCppBackend(model_name, n_threads) for _ in range(workers))
+    if name == 'mlx':
+        # A single Metal GPU: parallel calls would only queue behind each other
+        return (MlxWhisperBackend(model_name),)
+    raise ValueError(f"Unknown whisper backend: {name} (options: {', '.join(WHISPER_BACKENDS)})")
@@ -0,0 +1,59 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("pyannote.audio")
+
+import conversation_transcriber.conversation_transcriber as ct
+
+
+class FakeBatchClient:
+    """Batch job that never completes; cancelling it leaves the answer to the first request"""
+
+    def __init__(self):
+        self.files = self
+        self.batches = self
+        self.deleted = []
+        self.status = "in_progress"
+
+    # files
+    def create(self, file=None, purpose=None, **kwargs):
+        if purpose:
+            return SimpleNamespace(id="input")
+        return self.retrieve("batch")
+
+    def content(self, file_id):
+        answer = {"custom_id": "0", "response": {"status_code": 200, "body": {
+            "choices": [{"message": {"content": "answer"}}]}}}
+        return SimpleNamespace(text=json.dumps(answer))
+
+    def delete(self, file_id):
+        self.deleted.append(file_id)
+
+    # batches
+    def retrieve(self, batch_id):
+        cancelled = self.status == "cancelled"
+        return SimpleNamespace(id="batch", status=self.status, output_file_id="output" if cancelled else None,
+                               error_file_id="errors" if cancelled else None)
+
+    def cancel(self, batch_id):
+        self.status = "cancelled"
+        return SimpleNamespace(id="batch", status="cancelling", output_file_id=None, error_file_id=None)
+
+
+def test_timed_out_batch_keeps_partial_answers_and_deletes_all_its_files(monkeypatch):
+    client = FakeBatchClient()
+    monkeypatch.setattr(ct, "openai_client", lambda: client)
+    monkeypatch.setattr(ct, "BATCH_POLL_SECONDS", 0)
+    monkeypatch.setattr(ct, "cache_store", lambda *args: None)
+    requests = [("gpt-4o", [{"role": "user", "content": text}], 0.2) for text in ("a", "b")]
+
+    answers = ct.batch_chat_completions(requests, use_cache=False, deadline=ct.time.monotonic() + 0.05)
+
+    assert answers == ["answer", None]
+    assert sorted(client.deleted) == ["errors", "input", "output"]
+    # The wait is shared: once the deadline has passed, no further batch is submitted
+    client.deleted.clear()
+    assert ct.batch_chat_completions(requests, use_cache=False, deadline=ct.time.monotonic()) == [None, None]
+    assert client.deleted == []
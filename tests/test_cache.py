@@ -0,0 +1,34 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from conversation_transcriber import cache
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(cache, "_cache_bytes", None)
+    return tmp_path
+
+
+def test_concurrent_stores_of_one_key_leave_a_whole_entry(cache_dir):
+    answers = [{"content": str(i) * 10000} for i in range(10)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda data: cache.cache_store("llm", "key", data), answers * 5))
+    assert cache.cache_load("llm", "key")["content"] in [data["content"] for data in answers]
+    assert [name for name in os.listdir(cache_dir / "llm")] == ["key.json"]
+
+
+def test_stores_scan_the_cache_only_when_over_the_cap(cache_dir, monkeypatch):
+    scans = []
+    evict_cache = cache.evict_cache
+    monkeypatch.setattr(cache, "evict_cache", lambda: scans.append(1) or evict_cache(max_bytes=3000))
+    monkeypatch.setattr(cache, "MAX_CACHE_BYTES", 3000)
+    for i in range(10):
+        cache.cache_store("llm", f"key{i}", {"content": "x" * 1000})
+    # One scan on the first store, then one each time the counter passes the cap
+    assert 1 < len(scans) < 10
+    assert sum(os.path.getsize(cache_dir / "llm" / name) for name in os.listdir(cache_dir / "llm")) <= 3000
+    assert cache.cache_load("llm", "key9") is not None
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("pyannote.audio")
+
+from pyannote.core import Segment
+
+from conversation_transcriber.conversation_transcriber import link_speakers, match_overlap
+
+
+def test_same_voice_keeps_its_number_across_chunks():
+    centroids = []
+    assert link_speakers(["A", "B"], np.array([[1.0, 0.0], [0.0, 1.0]]), centroids) == {
+        "A": "SPEAKER_00", "B": "SPEAKER_01"}
+    assert link_speakers(["X", "Y"], np.array([[0.0, 0.9], [0.9, 0.1]]), centroids) == {
+        "X": "SPEAKER_01", "Y": "SPEAKER_00"}
+
+
+def test_zero_and_nan_embeddings_become_new_speakers_without_nan_distances():
+    centroids = []
+    link_speakers(["A"], np.array([[1.0, 0.0]]), centroids)
+    with np.errstate(all="raise"):
+        mapping = link_speakers(["B", "C", "D"], np.array([[0.0, 0.0], [np.nan, np.nan], [1.0, 0.1]]), centroids)
+    assert mapping == {"B": "SPEAKER_01", "C": "SPEAKER_02", "D": "SPEAKER_00"}
+    assert centroids[1] is None and centroids[2] is None
+
+
+def test_centroid_is_the_running_mean_of_a_speakers_embeddings():
+    centroids = []
+    link_speakers(["A"], np.array([[1.0, 0.0]]), centroids)
+    link_speakers(["A"], np.array([[0.0, 1.0]]), centroids, {"A": "SPEAKER_00"})
+    # (0.2, 0.98) is 0.8 away from the first embedding alone but 0.17 from the mean of both
+    assert link_speakers(["B"], np.array([[0.2, 0.98]]), centroids) == {"B": "SPEAKER_00"}
+
+
+def test_speakers_talking_in_both_copies_of_the_overlap_are_matched():
+    previous = [(Segment(95, 102), 0, "SPEAKER_00"), (Segment(102, 105), 1, "SPEAKER_01")]
+    turns = [(Segment(100, 102.2), 0, "A"), (Segment(102.2, 110), 1, "B"), (Segment(101.8, 102.3), 2, "C")]
+    assert match_overlap(previous, turns, Segment(100, 105)) == {"A": "SPEAKER_00", "B": "SPEAKER_01"}
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("pyannote.audio")
+
+from pyannote.core import Annotation, Segment
+
+import conversation_transcriber.conversation_transcriber as ct
+from conversation_transcriber.whisper_backends import SAMPLE_RATE, WhisperSegment
+
+
+class BatchingBackend:
+    """Like faster-whisper's batched pipeline: each clip is cut to its first 30 s, one word per second heard.
+
+    The test audio holds the second it was recorded at as its sample value, so a word names that second.
+    """
+
+    def transcribe_clips(self, clips, language=None):
+        results = []
+        for clip in clips:
+            heard = clip[:30 * SAMPLE_RATE]
+            results.append([WhisperSegment(k, k + 1, f"w{round(heard[k * SAMPLE_RATE] * 32768)}")
+                            for k in range(len(heard) // SAMPLE_RATE)])
+        return results
+
+
+def test_turn_longer_than_a_window_keeps_all_its_text(monkeypatch):
+    monkeypatch.setattr(ct, "load_whisper_backends", lambda *args: (BatchingBackend(),))
+    samples = np.repeat(np.arange(80, dtype=np.int16), SAMPLE_RATE)
+    diarization = Annotation()
+    diarization[Segment(0, 75)] = "SPEAKER_00"
+
+    transcript, segments = ct.run_diarization_and_transcription(samples, diarization=diarization,
+                                                                whisper_backend="faster-whisper")
+
+    assert len(segments) == 1
+    start, end, speaker, text = segments[0]
+    assert (start, end, speaker) == (0, 75, "00")
+    assert text.split() == [f"w{second}" for second in range(75)]
+
+
+def test_split_long_turns_makes_equal_pieces_of_at_most_a_window():
+    turns = [(Segment(0, 75), "A", "SPEAKER_00"), (Segment(80, 90), "B", "SPEAKER_01")]
+    pieces = ct.split_long_turns(turns)
+    assert [(piece.start, piece.end, index) for piece, index, _ in pieces] == [
+        (0, 25, 0), (25, 50, 0), (50, 75, 0), (80, 90, 1)]
+
+
+class OneSegmentBackend:
+    """Returns each clip as a single segment, as Whisper often does across a speaker change"""
+
+    def transcribe_clips(self, clips, language=None):
+        return [[WhisperSegment(0, len(clip) / SAMPLE_RATE,
+                                " ".join(f"w{round(clip[k * SAMPLE_RATE] * 32768)}"
+                                         for k in range(len(clip) // SAMPLE_RATE)))]
+                for clip in clips]
+
+
+def test_short_reply_keeps_its_own_text(monkeypatch):
+    monkeypatch.setattr(ct, "load_whisper_backends", lambda *args: (OneSegmentBackend(),))
+    samples = np.repeat(np.arange(30, dtype=np.int16), SAMPLE_RATE)
+    diarization = Annotation()
+    diarization[Segment(0, 10)] = "SPEAKER_00"
+    diarization[Segment(10, 12)] = "SPEAKER_01"
+    diarization[Segment(12, 20)] = "SPEAKER_00"
+
+    _, segments = ct.run_diarization_and_transcription(samples, diarization=diarization,
+                                                       whisper_backend="faster-whisper")
+
+    assert [(speaker, text) for _, _, speaker, text in segments] == [
+        ("00", " ".join(f"w{k}" for k in range(0, 10))),
+        ("01", "w10 w11"),
+        ("00", " ".join(f"w{k}" for k in range(12, 20))),
+    ]
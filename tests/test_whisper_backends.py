@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("pywhispercpp")
+
+from conversation_transcriber.whisper_backends import SAMPLE_RATE, FasterWhisperBackend
+
+
+class StubBatchedPipeline:
+    """Records the clip_timestamps and answers with one segment per clip, in seconds like faster-whisper"""
+
+    def __init__(self):
+        self.clip_timestamps = None
+
+    def transcribe(self, audio, clip_timestamps, **kwargs):
+        self.clip_timestamps = clip_timestamps
+        segments = [SimpleNamespace(start=clip["start"] / SAMPLE_RATE, end=clip["end"] / SAMPLE_RATE,
+                                    text=f"clip {k}")
+                    for k, clip in enumerate(clip_timestamps)]
+        return iter(segments), None
+
+
+def test_transcribe_clips_passes_sample_offsets():
+    backend = FasterWhisperBackend.__new__(FasterWhisperBackend)
+    backend.batched = StubBatchedPipeline()
+    clips = [np.zeros(n, dtype=np.float32) for n in (SAMPLE_RATE * 2, SAMPLE_RATE // 2, SAMPLE_RATE * 3)]
+
+    results = backend.transcribe_clips(clips)
+
+    assert backend.batched.clip_timestamps == [
+        {"start": 0, "end": 2 * SAMPLE_RATE},
+        {"start": 2 * SAMPLE_RATE, "end": 2 * SAMPLE_RATE + SAMPLE_RATE // 2},
+        {"start": 2 * SAMPLE_RATE + SAMPLE_RATE // 2, "end": 5 * SAMPLE_RATE + SAMPLE_RATE // 2},
+    ]
+    for clip in backend.batched.clip_timestamps:
+        assert type(clip["start"]) is int and type(clip["end"]) is int
+    # Segment times are mapped back to their clip and made relative to its start
+    assert [[(seg.start, seg.end, seg.text) for seg in segments] for segments in results] == [
+        [(0.0, 2.0, "clip 0")], [(0.0, 0.5, "clip 1")], [(0.0, 3.0, "clip 2")]]
+
+
+def test_transcribe_clips_without_clips():
+    backend = FasterWhisperBackend.__new__(FasterWhisperBackend)
+    assert backend.transcribe_clips([]) == []